@@ -0,0 +1,338 @@
+"""Benchmark of the ros directives on synthetic sphinx projects.
+
+Generate a project of N packages, each with M executables of K parameters and interfaces and
+M launch files of K arguments, shown by S pages, build it with ``sphinx-build`` for every
+requested ``-j`` value and write a json report. Everything runs locally, only sphinx is needed::
+
+    python bench/ros_bench.py --packages 20 --executables 5 --entities 100 -j 1 -j 4
+    python bench/ros_bench.py --shows 4
+    python bench/ros_bench.py --compare previous_report.json
+
+Each build reports its read and write time, the peak RSS of the main process and of the
+parallel workers, the size of the pickled environment and of the html output. The show()
+methods are also timed outside of sphinx. With ``--compare`` the exit code is 1 if a metric
+got worse than the previous report by more than ``--tolerance``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+EXT_DIR = Path(__file__).resolve().parent.parent / "ext"
+# Metrics compared with --compare, all of them are better when lower.
+COMPARED_METRICS = (
+    "read_s",
+    "write_s",
+    "total_s",
+    "peak_rss_kb",
+    "env_pickle_bytes",
+    "html_bytes",
+    "show_s",
+    "pickle_bytes",
+    "type_objects",
+)
+
+CONF_PY = """\
+import sys
+sys.path[:0] = [{ext_dir!r}, {project_dir!r}]
+project = "ros bench"
+extensions = ["ros_directives", "bench_timer"]
+"""
+
+# Extension recording the phase timings of the build, loaded by the generated conf.py.
+TIMER_PY = """\
+import json
+import resource
+import time
+
+TIMES = {}
+
+
+def builder_inited(app):
+    TIMES["start"] = time.perf_counter()
+
+
+def env_updated(app, env):
+    TIMES["read_end"] = time.perf_counter()
+
+
+def build_finished(app, exception):
+    end = time.perf_counter()
+    timings = {
+        "read_s": TIMES["read_end"] - TIMES["start"],
+        "write_s": end - TIMES["read_end"],
+        "total_s": end - TIMES["start"],
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "workers_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+    with open(app.outdir / "bench_timer.json", "w") as output:
+        json.dump(timings, output)
+
+
+def setup(app):
+    app.connect("builder-inited", builder_inited)
+    app.connect("env-updated", env_updated)
+    app.connect("build-finished", build_finished)
+    return {"parallel_read_safe": True, "parallel_write_safe": True}
+"""
+
+
+def package_rst(pkg: int, executables: int, entities: int) -> str:
+    """Return a document declaring one synthetic package."""
+    title = f"Package {pkg}"
+    lines = [
+        title,
+        "=" * len(title),
+        "",
+        f".. begin_ros_pkg:: pkg_{pkg}",
+        f"   :description: Synthetic package {pkg}.",
+        "",
+    ]
+    categories = ("topic in", "topic out", "service in", "service out", "action")
+    for exe in range(executables):
+        lines += [
+            f".. begin_ros_exec:: pkg_{pkg}_exec_{exe}",
+            f"   :short_descr: Executable {exe} of package {pkg}.",
+            "   :long_descr: Synthetic executable.",
+            "",
+        ]
+        for param in range(entities):
+            lines += [
+                f".. declare_ros_parameter:: param_{param}",
+                "   :type: double",
+                f"   :default: {param}.0",
+                f"   :description: Parameter {param}.",
+                "",
+            ]
+        for interface in range(entities):
+            lines += [
+                f".. declare_ros_interface:: /pkg_{pkg}/exec_{exe}/interface_{interface}",
+                f"   :description: Interface {interface}.",
+                f"   :category: {categories[interface % len(categories)]}",
+                "   :in_type: std_msgs/msg/String",
+                "   :out_type: std_msgs/msg/String",
+                "   :status_type: std_msgs/msg/String",
+                "",
+            ]
+        lines += [".. end_ros_exec::", ""]
+    for launch in range(executables):
+        lines += [
+            f".. begin_ros_launch:: pkg_{pkg}_launch_{launch}.launch.py",
+            f"   :short_descr: Launch file {launch} of package {pkg}.",
+            "   :long_descr: Synthetic launch file.",
+            f"   :exec_used: pkg_{pkg}_exec_{launch}",
+            "",
+        ]
+        for arg in range(entities):
+            lines += [
+                f".. declare_ros_arg:: arg_{arg}",
+                "   :type: string",
+                f"   :default: value_{arg}",
+                f"   :description: Argument {arg}.",
+                "",
+            ]
+        lines += [".. end_ros_launch::", ""]
+    lines += [".. end_ros_pkg::", ""]
+    return "\n".join(lines)
+
+
+def generate_project(
+    root: Path, packages: int, executables: int, entities: int, shows: int = 1
+) -> None:
+    """Write a synthetic project declaring packages, each shown by a page of every show dir."""
+    show_dirs = ["show", *(f"show{show}" for show in range(1, shows))]
+    (root / "declare").mkdir(parents=True, exist_ok=True)
+    for show_dir in show_dirs:
+        (root / show_dir).mkdir(exist_ok=True)
+    (root / "conf.py").write_text(
+        CONF_PY.format(ext_dir=str(EXT_DIR), project_dir=str(root)), encoding="utf-8"
+    )
+    (root / "bench_timer.py").write_text(TIMER_PY, encoding="utf-8")
+    globs = "".join(f"   {directory}/*\n" for directory in ["declare", *show_dirs])
+    (root / "index.rst").write_text(
+        f"ROS bench\n=========\n\n.. toctree::\n   :glob:\n\n{globs}", encoding="utf-8"
+    )
+    for pkg in range(packages):
+        (root / "declare" / f"pkg_{pkg}.rst").write_text(
+            package_rst(pkg, executables, entities), encoding="utf-8"
+        )
+        title = f"Show {pkg}"
+        for show_dir in show_dirs:
+            (root / show_dir / f"pkg_{pkg}.rst").write_text(
+                f"{title}\n{'=' * len(title)}\n\n.. show_ros_pkg:: pkg_{pkg}\n", encoding="utf-8"
+            )
+
+
+def tree_size(root: Path, pattern: str) -> int:
+    """Return the total size of the files matching a pattern."""
+    return sum(path.stat().st_size for path in root.rglob(pattern))
+
+
+def run_build(project: Path, jobs: str) -> dict:
+    """Build the project from scratch and return the build metrics."""
+    outdir = project / "_build" / f"j{jobs}"
+    doctrees = project / "_doctrees" / f"j{jobs}"
+    command = [
+        sys.executable,
+        "-m",
+        "sphinx",
+        "-q",
+        "-E",
+        "-j",
+        jobs,
+        "-d",
+        str(doctrees),
+        str(project),
+        str(outdir),
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, check=True)
+    metrics = {"jobs": jobs, "wall_s": time.perf_counter() - start}
+    metrics.update(json.loads((outdir / "bench_timer.json").read_text(encoding="utf-8")))
+    metrics["env_pickle_bytes"] = (doctrees / "environment.pickle").stat().st_size
+    metrics["html_bytes"] = tree_size(outdir, "*.html")
+    return metrics
+
+
+def run_show(packages: int, executables: int, entities: int) -> dict:
+    """Time the show() methods and the pickling of a registry built without sphinx."""
+    sys.path.insert(0, str(EXT_DIR))
+    from ros_directives import RosPackage
+
+    def synthetic_package(pkg: int) -> RosPackage:
+        package = RosPackage(f"pkg_{pkg}", "Synthetic package.", "doc")
+        for exe in range(executables):
+            name = f"pkg_{pkg}_exec_{exe}"
+            package.add_exec(name, short_descr="Executable.", long_descr="Synthetic.")
+            for param in range(entities):
+                package.executables[name].add_param(f"param_{param}", "double", "0.0", "Param.")
+            for interface in range(entities):
+                package.executables[name].add_interface(
+                    f"interface_{interface}",
+                    "Interface.",
+                    "service in",
+                    "std_msgs/msg/String",
+                    None,
+                    "std_msgs/msg/String",
+                    None,
+                    None,
+                    None,
+                )
+            package.add_launch(f"{name}.launch.py", None, "Launch.", "Synthetic.", [name])
+            for arg in range(entities):
+                package.launch[f"{name}.launch.py"].add_arg(f"arg_{arg}", "string", "", "Arg.")
+        return package
+
+    ros_pkg = {f"pkg_{pkg}": synthetic_package(pkg) for pkg in range(packages)}
+    ros_exec = {name: exe for pkg in ros_pkg.values() for name, exe in pkg.executables.items()}
+    start = time.perf_counter()
+    for package in ros_pkg.values():
+        package.show(ros_exec)
+    show_s = time.perf_counter() - start
+    start = time.perf_counter()
+    pickled = pickle.dumps(ros_pkg, pickle.HIGHEST_PROTOCOL)
+    pickle_s = time.perf_counter() - start
+    start = time.perf_counter()
+    reloaded = pickle.loads(pickled)  # noqa: S301, data produced just above
+    unpickle_s = time.perf_counter() - start
+    # A document read again after loading the environment declares its package anew, the
+    # records of both share their strings when type_objects is 1.
+    reloaded["pkg_0"] = synthetic_package(0)
+    types = [
+        param.param_type
+        for package in reloaded.values()
+        for executable in package.executables.values()
+        for param in executable.params
+    ]
+    return {
+        "show_s": show_s,
+        "pickle_s": pickle_s,
+        "unpickle_s": unpickle_s,
+        "pickle_bytes": len(pickled),
+        "type_objects": len({id(param_type) for param_type in types}),
+    }
+
+
+def compare(report: dict, previous: dict, tolerance: float) -> list[str]:
+    """Return the metrics of the report worse than the previous one beyond the tolerance."""
+    regressions = []
+    runs = [("show", report["show"], previous.get("show", {}))]
+    previous_builds = {build["jobs"]: build for build in previous.get("builds", [])}
+    runs += [
+        (f"-j {build['jobs']}", build, previous_builds.get(build["jobs"], {}))
+        for build in report["builds"]
+    ]
+    for name, metrics, old_metrics in runs:
+        for metric in COMPARED_METRICS:
+            if metric not in metrics or not old_metrics.get(metric):
+                continue
+            ratio = metrics[metric] / old_metrics[metric]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{name} {metric}: {old_metrics[metric]:.4g} -> {metrics[metric]:.4g}"
+                    f" (+{(ratio - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("--packages", type=int, default=10, help="number of packages")
+    parser.add_argument("--executables", type=int, default=4, help="executables per package")
+    parser.add_argument(
+        "--entities", type=int, default=50, help="parameters, interfaces and arguments each"
+    )
+    parser.add_argument(
+        "--shows", type=int, default=1, help="pages showing each package, in separate dirs"
+    )
+    parser.add_argument(
+        "-j", "--jobs", action="append", help="sphinx-build -j values (default: 1 and auto)"
+    )
+    parser.add_argument("--output", default="ros_bench.json", help="report file")
+    parser.add_argument("--compare", help="previous report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative loss")
+    parser.add_argument("--keep", help="generate the project in this directory and keep it")
+    options = parser.parse_args()
+
+    size = (options.packages, options.executables, options.entities)
+    report = {
+        "config": {
+            "packages": options.packages,
+            "executables": options.executables,
+            "entities": options.entities,
+            "shows": options.shows,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "show": run_show(*size),
+        "builds": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="ros_bench_") as tmp_dir:
+        project = Path(options.keep) if options.keep else Path(tmp_dir)
+        generate_project(project, *size, options.shows)
+        for jobs in options.jobs or ["1", "auto"]:
+            report["builds"].append(run_build(project, jobs))
+
+    Path(options.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    if options.compare:
+        previous = json.loads(Path(options.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, previous, options.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+# Configuration file of a project using the ros directives of ext, built by the workflow of
+# this repository with the builders of the action.
+import sys
+from pathlib import Path
+# Extensions of this repository, the action also puts them on the python path.
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'ext'))
+
+project = 'ROS example'
+copyright = '2024, HawAI.tech'
+author = 'HawAI.tech'
+
+extensions = ['ros_directives']
+
+html_theme = 'sphinx_rtd_theme'
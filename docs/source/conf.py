@@ -9,7 +9,11 @@ import os
 os.environ['SPHINX_APIDOC_OPTIONS']='members,show-inheritance'
 
 import sys
+from importlib.util import find_spec
+from pathlib import Path
 sys.path.insert(0, os.path.abspath(os.path.join('..', '..', '../src')))
+# Extensions of this repository, the action also puts them on the python path.
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'ext'))
 
 project = '>Sphinx-builder'
 copyright = '2024, HawAI.tech'
@@ -23,6 +27,8 @@ extensions = [
    'sphinxcontrib.apidoc',
    'sphinx.ext.napoleon'
 ]
+if find_spec('apidoc_cache') is not None:
+   extensions.append('apidoc_cache')
 
 templates_path = ['_templates']
 exclude_patterns = []
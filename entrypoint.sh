@@ -1,24 +1,187 @@
 #!/bin/sh
 
+# "serve" as first argument previews the documentation instead, see ext/live_serve.py
+MODE=build
+if [ "$1" = "serve" ]; then
+    MODE=serve
+    shift
+fi
+
 SOURCE_ROOT=$1
 BUILD_ROOT=$2
-BRANCH_NAME=$3
+if [ "$MODE" = "build" ]; then
+    # When serving, the following arguments are options of live_serve.py
+    BRANCH_NAME=$3
+    CACHE_ROOT=$4
+    ROS_PROFILE=$5
+    BUILDER=${6:-html}
+    APIDOC_CACHE=${7:-false}
+    LINT=${8:-false}
+    VERSIONS=$9
+    PRECOMPRESS=${10:-false}
+    AGGREGATE=${11}
+fi
 
-mkdir -p $BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
-python3 -m venv .venv
+SPHINX_VENV=${SPHINX_VENV:-/opt/sphinx-venv}
+
+if [ -n "$AGGREGATE" ]; then
+    # Merge the ros registries of other builds instead of building, see ext/ros_aggregate.py
+    exec $SPHINX_VENV/bin/python /ext/ros_aggregate.py $BUILD_ROOT $AGGREGATE
+fi
+
+# Fingerprint of the inputs hashed before building and of the files the last build read from
+# outside the sources, listed by ext/build_inputs.py
+fingerprint() {
+    (
+        echo "$SOURCES_FINGERPRINT"
+        if [ -f "$INPUTS_FILE" ]; then
+            while IFS= read -r input; do
+                echo "$input"
+                find "$input" -name '.?*' -prune -o -type f -print0 2>/dev/null \
+                    | sort -z | xargs -0 -r sha256sum
+            done < "$INPUTS_FILE"
+        fi
+    ) | sha256sum | cut -d' ' -f1
+}
+
+if [ "$MODE" = "build" ] && [ "$LINT" != "true" ]; then
+    # Nothing is installed nor built when no input changed since the output was built: the
+    # arguments, the sources with conf.py and requirements.txt, the files the last build read
+    # from outside the sources, the extensions, the toolchain and the commit of every version.
+    OUTPUT_DIR=$BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
+    if [ -n "$VERSIONS" ]; then
+        OUTPUT_DIR=$BUILD_ROOT/$GITHUB_REPOSITORY
+        git config --global --add safe.directory "$GITHUB_WORKSPACE"
+    fi
+    FINGERPRINT_FILE=$OUTPUT_DIR/.build_fingerprint
+    INPUTS_FILE=$OUTPUT_DIR/.build_inputs
+    SOURCES_FINGERPRINT=$( (
+        echo "$*"
+        (cd $SOURCE_ROOT && find . -type f -print0 | sort -z | xargs -0 -r sha256sum)
+        (cd /ext && find . -type f -print0 | sort -z | xargs -0 -r sha256sum)
+        ls $SPHINX_VENV/lib/python3*/site-packages
+        for ref in $VERSIONS; do
+            git rev-parse -q --verify "$ref^{commit}" || git rev-parse -q --verify "origin/$ref^{commit}"
+        done
+    ) | sha256sum | cut -d' ' -f1)
+    FINGERPRINT=$(fingerprint)
+    if [ -f "$FINGERPRINT_FILE" ] && [ "$(cat $FINGERPRINT_FILE)" = "$FINGERPRINT" ]; then
+        echo "Inputs unchanged since the build in $OUTPUT_DIR, nothing to do"
+        # Nothing to publish either
+        for delta in $OUTPUT_DIR/.publish_changed.txt $OUTPUT_DIR/.publish_removed.txt; do
+            if [ -f "$delta" ]; then
+                : > $delta
+            fi
+        done
+        exit 0
+    fi
+    # A failed or interrupted build is never skipped
+    rm -f $FINGERPRINT_FILE
+fi
 
 if [ -f "$SOURCE_ROOT/requirements.txt" ]; then
     echo "Installation of requirements"
-    .venv/bin/pip install -U sphinx
-    .venv/bin/pip install -r $SOURCE_ROOT/requirements.txt
+    if [ -n "$CACHE_ROOT" ]; then
+        # Wheels are kept per requirements content and python version, a warm cache works offline
+        REQUIREMENTS_HASH=$( (cat $SOURCE_ROOT/requirements.txt; python3 --version) | sha256sum | cut -c1-16)
+        WHEEL_DIR=$CACHE_ROOT/wheels/$REQUIREMENTS_HASH
+        if [ ! -f "$WHEEL_DIR/.complete" ]; then
+            echo "Downloading requirements into $WHEEL_DIR"
+            mkdir -p $WHEEL_DIR
+            $SPHINX_VENV/bin/pip wheel -q -w $WHEEL_DIR -r $SOURCE_ROOT/requirements.txt \
+                && touch $WHEEL_DIR/.complete
+        fi
+        $SPHINX_VENV/bin/pip install --no-index --find-links $WHEEL_DIR -r $SOURCE_ROOT/requirements.txt
+    else
+        # Requirements already satisfied by the preinstalled toolchain are skipped
+        $SPHINX_VENV/bin/pip install -r $SOURCE_ROOT/requirements.txt
+    fi
 else
     echo "No installation requirements found"
 fi
 
+if [ "$MODE" = "serve" ]; then
+    # Remaining arguments are options of live_serve.py, the extensions are used in place
+    shift 2
+    export PYTHONPATH=$PYTHONPATH:/ext
+    exec $SPHINX_VENV/bin/python /ext/live_serve.py $SOURCE_ROOT $BUILD_ROOT --host 0.0.0.0 "$@"
+fi
+
+mkdir -p $BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
+
 cp -r /ext $SOURCE_ROOT/ext
 echo $(ls $SOURCE_ROOT/ext)
 
 export PYTHONPATH=$PYTHONPATH:"$SOURCE_ROOT/ext"
 
+SPHINX_OPTS="-b $BUILDER"
+if [ "$LINT" = "true" ]; then
+    # Only the documents using ros directives are read, every problem is reported before failing
+    SPHINX_OPTS="-b roslint -E -W --keep-going -d $(mktemp -d)"
+    # The cached doctrees are left untouched
+    CACHE_ROOT=
+fi
+if [ -n "$ROS_PROFILE" ]; then
+    SPHINX_OPTS="$SPHINX_OPTS -D ros_profile=$ROS_PROFILE"
+fi
+if [ -n "$VERSIONS" ] && [ "$LINT" != "true" ]; then
+    # Every ref is exported from git and built by its own process, see ext/multi_version.py
+    MULTI_OPTS="--source $SOURCE_ROOT --output $BUILD_ROOT/$GITHUB_REPOSITORY"
+    if [ -n "$CACHE_ROOT" ]; then
+        MULTI_OPTS="$MULTI_OPTS --cache $CACHE_ROOT/$GITHUB_REPOSITORY"
+        if [ "$APIDOC_CACHE" = "true" ]; then
+            MULTI_OPTS="$MULTI_OPTS --apidoc-cache"
+        fi
+    fi
+    TZ=UTC $SPHINX_VENV/bin/python /ext/multi_version.py $MULTI_OPTS $VERSIONS -- $SPHINX_OPTS \
+        || exit $?
+    if [ "$PRECOMPRESS" = "true" ]; then
+        $SPHINX_VENV/bin/python /ext/publish_output.py $OUTPUT_DIR
+    fi
+    echo $FINGERPRINT > $FINGERPRINT_FILE
+    exit 0
+fi
+DOCTREE_DIR=$BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME/.doctrees
+if [ -n "$CACHE_ROOT" ]; then
+    # Doctrees and environment.pickle are kept per branch so the next run only re-reads changes
+    DOCTREE_DIR=$CACHE_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
+    mkdir -p $DOCTREE_DIR
+    SOURCES_MANIFEST=$(realpath $DOCTREE_DIR)/sources.sha256
+    SPHINX_OPTS="$SPHINX_OPTS -d $DOCTREE_DIR"
+    if [ "$APIDOC_CACHE" = "true" ]; then
+        # Fingerprints of the modules documented by sphinxcontrib.apidoc, see ext/apidoc_cache.py
+        SPHINX_OPTS="$SPHINX_OPTS -D apidoc_cache_dir=$(realpath $DOCTREE_DIR)/apidoc"
+    fi
+
+    # A fresh checkout gives every file a new mtime, which makes sphinx re-read everything.
+    # Sources whose content did not change since the cached build get back an older mtime.
+    if [ -f "$SOURCES_MANIFEST" ]; then
+        (cd $SOURCE_ROOT && sha256sum -c "$SOURCES_MANIFEST" 2>/dev/null) \
+            | sed -n 's/: OK$//p' \
+            | while IFS= read -r source_file; do
+                touch -r "$SOURCES_MANIFEST" "$SOURCE_ROOT/$source_file"
+            done
+        echo "Reusing cached doctrees from $DOCTREE_DIR"
+    else
+        echo "No cached doctrees found in $DOCTREE_DIR"
+    fi
+    (cd $SOURCE_ROOT && find . -type f -print0 | xargs -0 sha256sum) > $SOURCES_MANIFEST.new
+    mv $SOURCES_MANIFEST.new $SOURCES_MANIFEST
+fi
+
 # TZ is because of bazel issue see https://github.com/nektos/act/issues/1853
-TZ=UTC .venv/bin/sphinx-build $GITHUB_WORKSPACE/$SOURCE_ROOT $BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
+TZ=UTC $SPHINX_VENV/bin/sphinx-build $SPHINX_OPTS $GITHUB_WORKSPACE/$SOURCE_ROOT $BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME \
+    || exit $?
+if [ "$PRECOMPRESS" = "true" ] && [ "$LINT" != "true" ]; then
+    # Compressed siblings, manifest and list of the changed files, see ext/publish_output.py
+    $SPHINX_VENV/bin/python /ext/publish_output.py $BUILD_ROOT/$GITHUB_REPOSITORY/$BRANCH_NAME
+fi
+if [ -n "$FINGERPRINT_FILE" ]; then
+    # Without the list of the files read outside the sources, the build is never skipped
+    if $SPHINX_VENV/bin/python /ext/build_inputs.py $DOCTREE_DIR > $INPUTS_FILE.new; then
+        mv $INPUTS_FILE.new $INPUTS_FILE
+        fingerprint > $FINGERPRINT_FILE
+    else
+        rm -f $INPUTS_FILE.new $INPUTS_FILE
+    fi
+fi
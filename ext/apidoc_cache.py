@@ -0,0 +1,116 @@
+"""Keep the api pages generated by sphinxcontrib.apidoc incremental between builds.
+
+sphinxcontrib.apidoc writes an rst file per module on every build and autodoc makes each
+page depend on the source of its module. After a fresh checkout every generated file and
+every module is new, so sphinx reads every api page again. The generated files and modules
+whose fingerprint did not change get back the modification time of the build which first
+saw it, older than the cached doctrees, so only the pages of changed modules are read again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sphinx.util import logging
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "apidoc_cache.json"
+
+
+def file_digest(path: Path) -> str:
+    """Return the sha256 of a file content."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def module_source(root: Path, module: str) -> Path | None:
+    """Return the source file of a dotted module name, None if it is not a python file."""
+    path = root.joinpath(*module.split("."))
+    for candidate in (path.with_suffix(".py"), path / "__init__.py"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def fingerprint_apidoc(module_dir: Path, output_dir: Path) -> tuple[dict, dict]:
+    """Return the fingerprints of the module sources and of the generated rst files.
+
+    The fingerprint of a generated file covers its content and the source of its module.
+    """
+    sources = {
+        str(path.relative_to(module_dir)): file_digest(path)
+        for path in sorted(module_dir.rglob("*.py"))
+    }
+    # apidoc prefixes the module names with the directory name when it is a package.
+    root = module_dir.parent if (module_dir / "__init__.py").is_file() else module_dir
+    generated = {}
+    for path in sorted(output_dir.glob("*.rst")):
+        source = module_source(root, path.stem)
+        source_digest = sources.get(str(source.relative_to(module_dir)), "") if source else ""
+        generated[path.name] = hashlib.sha256(
+            (file_digest(path) + source_digest).encode()
+        ).hexdigest()
+    return sources, generated
+
+
+def restore_apidoc_mtimes(app: Sphinx) -> None:
+    """Give the unchanged generated files and modules the modification time of their build."""
+    cache_dir = app.config.apidoc_cache_dir
+    module_dir = app.config.apidoc_module_dir
+    if not cache_dir or not module_dir:
+        return
+    module_dir = (app.srcdir / module_dir).resolve()
+    output_dir = app.srcdir / app.config.apidoc_output_dir
+    if not module_dir.is_dir() or not output_dir.is_dir():
+        return
+    manifest = (app.confdir / cache_dir).resolve() / MANIFEST
+    sources, generated = fingerprint_apidoc(module_dir, output_dir)
+
+    # Each fingerprint keeps the time of the build that first saw it, taken before reading.
+    # The documents depending on it were read after that time, unless they changed since.
+    now = time.time_ns()
+    previous = {}
+    if manifest.is_file():
+        previous = json.loads(manifest.read_text(encoding="utf-8"))
+    entries = {}
+    restored = 0
+    for fingerprints, directory in ((sources, module_dir), (generated, output_dir)):
+        for name, digest in fingerprints.items():
+            digest_stamp = previous.get(name)
+            if digest_stamp is None or digest_stamp[0] != digest:
+                entries[name] = [digest, now]
+                continue
+            entries[name] = digest_stamp
+            path = directory / name
+            stamp = digest_stamp[1]
+            if path.stat().st_mtime_ns > stamp:
+                os.utime(path, ns=(stamp, stamp))
+                if directory is output_dir:
+                    restored += 1
+    changed = sum(entries[name][1] == now for name in generated)
+    logger.info("apidoc cache: %d api pages changed, %d restored", changed, restored)
+
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    with manifest.open("w", encoding="utf-8") as output:
+        json.dump(entries, output, indent=1, sort_keys=True)
+
+
+def setup(app: Sphinx) -> dict:
+    """Restore the modification times once sphinxcontrib.apidoc generated the api pages."""
+    # Directory keeping the fingerprints of the previous builds, empty to disable.
+    app.add_config_value("apidoc_cache_dir", "", "", types=[str])
+    # sphinxcontrib.apidoc generates the pages on builder-inited with the default priority.
+    app.connect("builder-inited", restore_apidoc_mtimes, priority=600)
+    return {
+        "version": "0.1",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
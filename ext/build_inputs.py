@@ -0,0 +1,73 @@
+"""List the files and directories a sphinx build read from outside its source directory.
+
+Run after a build with its doctrees directory::
+
+    python ext/build_inputs.py docs/build/html/.doctrees
+
+Prints one absolute path per line: the dependencies noted by the documents, such as parameter
+files and included files, the ros workspaces of ``declare_ros_workspace``, the directories of
+``ros_interface_dirs`` and the modules of ``apidoc_module_dir``. entrypoint.sh hashes them with
+the sources to tell whether a build can be skipped. Every extension of the build has to be
+importable, since the pickled environment holds their data.
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+ENV_PICKLE = "environment.pickle"
+
+
+def config_value(env: object, name: str, default: object) -> object:
+    """Return a configuration value of the build, default if no extension declared it."""
+    try:
+        return getattr(env.config, name)
+    except AttributeError:
+        return default
+
+
+def build_inputs(doctrees: Path) -> list[str]:
+    """Return the paths read by the build of a doctrees directory outside its sources."""
+    with (doctrees / ENV_PICKLE).open("rb") as file:
+        env = pickle.load(file)
+    srcdir = Path(env.srcdir).resolve()
+    # Relative to the source directory before sphinx 8, absolute paths are kept by the join.
+    paths = {srcdir / path for paths in env.dependencies.values() for path in paths}
+    paths.update(
+        Path(root) for roots in getattr(env, "ros_ws_listing", {}).values() for root in roots
+    )
+    # Relative to conf.py, the action keeps it in the source directory.
+    paths.update(srcdir / name for name in config_value(env, "ros_interface_dirs", []))
+    module_dir = config_value(env, "apidoc_module_dir", None)
+    if module_dir:
+        paths.add(srcdir / module_dir)
+    outside = {path.resolve() for path in paths}
+    outside = {path for path in outside if not path.is_relative_to(srcdir)}
+    # Files of a listed directory are hashed with it.
+    directories = [path for path in outside if path.is_dir()]
+    return sorted(
+        str(path)
+        for path in outside
+        if not any(path != parent and path.is_relative_to(parent) for parent in directories)
+    )
+
+
+def main() -> int:
+    """Print the inputs of the build of the doctrees directory given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("doctrees", type=Path, help="doctrees directory of the build")
+    options = parser.parse_args()
+    try:
+        inputs = build_inputs(options.doctrees)
+    except (OSError, pickle.UnpicklingError, AttributeError, ImportError) as error:
+        print(f"build_inputs: cannot read the environment: {error}", file=sys.stderr)
+        return 1
+    print("".join(f"{path}\n" for path in inputs), end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Local preview: build the documentation again when its sources change and reload the browser.
+
+Serve a build directory while watching the source directory, and any other directory given
+with ``--watch`` such as a ros workspace read by ``declare_ros_workspace``::
+
+    python ext/live_serve.py docs/source docs/build --port 8000 --watch ~/ros_ws/src
+
+Sources are polled for changes and a burst of changes, such as an editor saving many files or
+a git checkout, is built once after ``--delay`` seconds without any further change. Builds are
+incremental: doctrees are kept between builds, so sphinx only reads the changed documents again
+and the ros directives only write again the pages showing what they declare. Html pages are
+served with a script reloading them once a build succeeds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+EVENTS_PATH = "/_live_serve/events"
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{EVENTS_PATH}").onmessage = () => location.reload();</script>'
+).encode()
+# Directories never holding sources.
+SKIPPED_DIRS = {"__pycache__", "node_modules"}
+# Seconds between two comments keeping an idle event stream open.
+KEEP_ALIVE = 15
+
+
+class Builds:
+    """Number of the last successful build, waited for by the event streams."""
+
+    def __init__(self) -> None:
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def done(self) -> None:
+        """Wake up the event streams after a successful build."""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> int:
+        """Return the last build number once it is newer than generation, or after timeout."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation > generation, timeout)
+            return self.generation
+
+
+def snapshot(roots: list[Path], ignored: list[Path]) -> dict[str, tuple[int, int]]:
+    """Return the modification time and size of every file under the roots."""
+    files = {}
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if not name.startswith(".")
+                and name not in SKIPPED_DIRS
+                and Path(directory, name) not in ignored
+            ]
+            for name in filenames:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(old: dict, new: dict) -> list[str]:
+    """Return the files added, removed or modified between two snapshots."""
+    return sorted(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
+
+
+def build(command: list[str], builds: Builds) -> None:
+    """Run sphinx-build and wake the pages up if it succeeded."""
+    start = time.perf_counter()
+    result = subprocess.run(command, check=False)
+    elapsed = time.perf_counter() - start
+    if result.returncode == 0:
+        print(f"live_serve: built in {elapsed:.1f} s", flush=True)
+        builds.done()
+    else:
+        print(f"live_serve: build failed in {elapsed:.1f} s, pages not reloaded", flush=True)
+
+
+def watch(options: argparse.Namespace, command: list[str], builds: Builds) -> None:
+    """Build again once the sources stopped changing for the debounce delay."""
+    roots = [options.source, *options.watch]
+    ignored = [options.build, options.doctrees]
+    current = snapshot(roots, ignored)
+    while True:
+        time.sleep(options.interval)
+        latest = snapshot(roots, ignored)
+        if latest == current:
+            continue
+        # Wait for the end of the burst, every new change restarting the delay.
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < options.delay:
+            time.sleep(options.interval)
+            following = snapshot(roots, ignored)
+            if following != latest:
+                latest = following
+                quiet_since = time.monotonic()
+        changes = changed_files(current, latest)
+        shown = ", ".join(os.path.relpath(path) for path in changes[:5])
+        more = f" and {len(changes) - 5} more" if len(changes) > 5 else ""  # noqa: PLR2004
+        print(f"live_serve: {shown}{more} changed", flush=True)
+        # Changes made while building are seen by the next snapshot.
+        current = latest
+        build(command, builds)
+
+
+class LiveHandler(SimpleHTTPRequestHandler):
+    """Serve the build directory, adding the reload script to the html pages."""
+
+    builds: Builds
+
+    def do_GET(self) -> None:
+        """Serve the event stream, the html pages with the reload script or any other file."""
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if path == EVENTS_PATH:
+            self.send_events()
+            return
+        local = Path(self.translate_path(self.path))
+        if local.is_dir() and path.endswith("/"):
+            local = local / "index.html"
+        if local.suffix == ".html" and local.is_file():
+            self.send_page(local)
+            return
+        super().do_GET()
+
+    def send_page(self, local: Path) -> None:
+        """Send an html page with the reload script."""
+        content = local.read_bytes().replace(b"</body>", RELOAD_SCRIPT + b"</body>", 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_events(self) -> None:
+        """Stream a reload event after each successful build until the page is left."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        generation = self.builds.generation
+        try:
+            while True:
+                latest = self.builds.wait(generation, KEEP_ALIVE)
+                self.wfile.write(b"data: reload\n\n" if latest > generation else b": idle\n\n")
+                self.wfile.flush()
+                generation = latest
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def end_headers(self) -> None:
+        """Never let the browser keep a page of a previous build."""
+        if self.path.split("?", 1)[0] != EVENTS_PATH:
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002, base signature
+        """Keep the terminal for the build output."""
+
+
+def main() -> int:
+    """Build, then serve and watch until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("source", type=Path, help="sphinx source directory")
+    parser.add_argument("build", type=Path, help="html output directory")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument(
+        "--watch", type=Path, action="append", default=[], help="other directory to watch"
+    )
+    parser.add_argument("--doctrees", type=Path, help="doctrees directory (build/.doctrees)")
+    parser.add_argument(
+        "--delay", type=float, default=0.5, help="seconds without change before building"
+    )
+    parser.add_argument("--interval", type=float, default=0.3, help="seconds between polls")
+    parser.epilog = "Options after -- are given to sphinx-build."
+    arguments = sys.argv[1:]
+    sphinx_options = []
+    if "--" in arguments:
+        position = arguments.index("--")
+        arguments, sphinx_options = arguments[:position], arguments[position + 1 :]
+    options = parser.parse_args(arguments)
+    options.source = options.source.resolve()
+    options.build = options.build.resolve()
+    options.watch = [directory.resolve() for directory in options.watch]
+    options.doctrees = (options.doctrees or options.build / ".doctrees").resolve()
+    command = [
+        sys.executable,
+        "-m",
+        "sphinx",
+        "-b",
+        "html",
+        "-d",
+        str(options.doctrees),
+        *sphinx_options,
+        str(options.source),
+        str(options.build),
+    ]
+
+    builds = Builds()
+    build(command, builds)
+    threading.Thread(target=watch, args=(options, command, builds), daemon=True).start()
+    handler = functools.partial(LiveHandler, directory=str(options.build))
+    LiveHandler.builds = builds
+    server = ThreadingHTTPServer((options.host, options.port), handler)
+    server.daemon_threads = True
+    print(f"live_serve: serving http://{options.host}:{options.port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Build the documentation of several git refs in one run, sharing caches and identical files.
+
+Each ref is exported from git and built by its own sphinx-build process, at most ``--jobs``
+at once, all using the installed toolchain::
+
+    python ext/multi_version.py --source docs/source --output docs/build main release/1.0 -- -b html
+
+The html of a ref is written in ``output/<ref>``. With ``--cache``, the doctrees of a ref are
+kept in ``cache/<ref>`` as for a single build, and the sources whose content did not change
+since the cached build get back an older modification time, so only the changed documents
+are read again. Once every ref is built, identical output files of the versions are
+hardlinked to a single copy on disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Fingerprints of the sources of the cached builds of a ref, next to its doctrees.
+SOURCES_MANIFEST = "sources.json"
+
+
+def file_digest(path: Path) -> str:
+    """Return the sha256 of a file content."""
+    with path.open("rb") as content:
+        return hashlib.file_digest(content, "sha256").hexdigest()
+
+
+def resolve_ref(repo: Path, ref: str) -> str:
+    """Return the ref, or its remote branch when a checkout only fetched the remote branches."""
+    for candidate in (ref, f"origin/{ref}"):
+        result = subprocess.run(
+            ["git", "-C", str(repo), "rev-parse", "--verify", "--quiet", f"{candidate}^{{commit}}"],
+            check=False,
+            capture_output=True,
+        )
+        if result.returncode == 0:
+            return candidate
+    return ref
+
+
+def export_ref(repo: Path, ref: str, destination: Path) -> None:
+    """Extract the tree of a git ref in destination."""
+    command = ["git", "-C", str(repo), "archive", "--format=tar", resolve_ref(repo, ref)]
+    with (
+        subprocess.Popen(command, stdout=subprocess.PIPE) as archive,
+        tarfile.open(fileobj=archive.stdout, mode="r|") as tar,
+    ):
+        tar.extractall(destination, filter="data")
+    if archive.returncode:
+        raise subprocess.CalledProcessError(archive.returncode, archive.args)
+
+
+def restore_mtimes(source: Path, manifest: Path) -> int:
+    """Give the sources unchanged since a cached build the time of that build.
+
+    Each fingerprint keeps the time of the build that first saw it, taken before reading, as in
+    apidoc_cache, and new or changed sources get that time. Update the manifest and return the
+    number of restored sources.
+    """
+    now = time.time_ns()
+    previous = {}
+    if manifest.is_file():
+        previous = json.loads(manifest.read_text(encoding="utf-8"))
+    entries = {}
+    restored = 0
+    for path in sorted(source.rglob("*")):
+        if not path.is_file():
+            continue
+        name = path.relative_to(source).as_posix()
+        digest = file_digest(path)
+        digest_stamp = previous.get(name)
+        if digest_stamp is None or digest_stamp[0] != digest:
+            # git archive gives the commit time, older than the cached build for a tag or a
+            # commit pushed late, so new content gets the time of this build.
+            entries[name] = [digest, now]
+            os.utime(path, ns=(now, now))
+            continue
+        entries[name] = digest_stamp
+        os.utime(path, ns=(digest_stamp[1], digest_stamp[1]))
+        restored += 1
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    with manifest.open("w", encoding="utf-8") as output:
+        json.dump(entries, output, indent=1, sort_keys=True)
+    return restored
+
+
+def separate(directory: Path) -> None:
+    """Give back its own copy to every hardlinked file, sphinx writing over its outputs."""
+    for path in directory.rglob("*"):
+        if path.is_file() and path.stat().st_nlink > 1:
+            copy = path.with_name(f"{path.name}.separate")
+            shutil.copy2(path, copy)
+            copy.replace(path)
+
+
+def deduplicate(directories: list[Path]) -> tuple[int, int]:
+    """Hardlink the identical files of the directories, return their number and bytes saved."""
+    by_size = {}
+    for directory in directories:
+        for path in directory.rglob("*"):
+            if path.is_file() and not path.is_symlink():
+                by_size.setdefault(path.stat().st_size, []).append(path)
+    linked = 0
+    saved = 0
+    for size, paths in by_size.items():
+        if len(paths) < 2 or size == 0:  # noqa: PLR2004, pairs
+            continue
+        # Only the files sharing their size with another one are read.
+        first_of = {}
+        for path in paths:
+            digest = file_digest(path)
+            first = first_of.setdefault(digest, path)
+            if first is path or first.stat().st_ino == path.stat().st_ino:
+                continue
+            link = path.with_name(f"{path.name}.dedupe")
+            os.link(first, link)
+            link.replace(path)
+            linked += 1
+            saved += size
+    return linked, saved
+
+
+def build_version(
+    ref: str, options: argparse.Namespace, sphinx_options: list[str]
+) -> tuple[str, int, float, str]:
+    """Export and build a ref, return it with the exit code, time and output of sphinx-build."""
+    start = time.perf_counter()
+    output = options.output / ref
+    command = [sys.executable, "-m", "sphinx", *sphinx_options]
+    notes = []
+    with tempfile.TemporaryDirectory(prefix="multi_version-") as temporary:
+        checkout = Path(temporary)
+        if options.cache:
+            doctrees = (options.cache / ref).resolve()
+            # Sphinx reads everything again when the source directory moves.
+            checkout = doctrees / "checkout"
+            shutil.rmtree(checkout, ignore_errors=True)
+            command += ["-d", str(doctrees)]
+            if options.apidoc_cache:
+                command += ["-D", f"apidoc_cache_dir={doctrees / 'apidoc'}"]
+        try:
+            export_ref(options.repo, ref, checkout)
+        except (subprocess.CalledProcessError, tarfile.TarError) as error:
+            return ref, 1, time.perf_counter() - start, f"cannot export {ref}: {error}"
+        source = checkout / options.source
+        if options.cache:
+            restored = restore_mtimes(source, doctrees / SOURCES_MANIFEST)
+            notes.append(f"{restored} unchanged sources reuse the doctrees of {doctrees}")
+        if output.is_dir():
+            separate(output)
+        command += [str(source), str(output)]
+        result = subprocess.run(
+            command, check=False, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+    log = "\n".join([*notes, result.stdout])
+    return ref, result.returncode, time.perf_counter() - start, log
+
+
+def main() -> int:
+    """Build every ref, then deduplicate the outputs of the successful builds."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("refs", nargs="+", help="git refs to build")
+    parser.add_argument("--source", type=Path, required=True, help="source directory in the refs")
+    parser.add_argument("--output", type=Path, required=True, help="directory of the versions")
+    parser.add_argument("--repo", type=Path, default=Path(), help="git repository (.)")
+    parser.add_argument("--cache", type=Path, help="directory of the doctrees of the versions")
+    parser.add_argument(
+        "--apidoc-cache",
+        action="store_true",
+        help="keep apidoc pages incremental, see apidoc_cache",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="concurrent builds")
+    parser.epilog = "Options after -- are given to sphinx-build."
+    arguments = sys.argv[1:]
+    sphinx_options = []
+    if "--" in arguments:
+        position = arguments.index("--")
+        arguments, sphinx_options = arguments[:position], arguments[position + 1 :]
+    options = parser.parse_args(arguments)
+    options.output = options.output.resolve()
+
+    built = []
+    failed = []
+    # Threads only wait for the sphinx-build processes doing the work.
+    with ThreadPoolExecutor(max_workers=min(options.jobs, len(options.refs))) as pool:
+        for ref, returncode, elapsed, log in pool.map(
+            lambda ref: build_version(ref, options, sphinx_options), options.refs
+        ):
+            print(f"::group::{ref}\n{log}\n::endgroup::", flush=True)
+            if returncode == 0:
+                print(f"multi_version: {ref} built in {elapsed:.1f} s", flush=True)
+                built.append(options.output / ref)
+            else:
+                print(f"multi_version: {ref} failed in {elapsed:.1f} s", flush=True)
+                failed.append(ref)
+    linked, saved = deduplicate(built)
+    print(f"multi_version: {linked} identical files linked, {saved / 1e6:.1f} MB saved")
+    if failed:
+        print(f"multi_version: failed builds: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Prepare a build directory for publishing: precompressed files, manifest and changes.
+
+Run after sphinx-build on the output directory::
+
+    python ext/publish_output.py docs/build/html
+
+Every text file, such as html, javascript, css, json or svg, gets ``.gz`` and, with the
+``brotli`` package, ``.br`` siblings a web server can send as they are. The sha256 of every
+output file is kept in ``.publish_manifest.json``, the files changed since the previous run,
+compressed siblings included, are listed in ``.publish_changed.txt`` and the removed ones in
+``.publish_removed.txt``, for instance for ``rsync --files-from``. Only the changed files are
+compressed again, in a process pool. The doctrees and ``.buildinfo`` of sphinx are not published.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+MANIFEST = ".publish_manifest.json"
+CHANGED = ".publish_changed.txt"
+REMOVED = ".publish_removed.txt"
+COMPRESSED_SUFFIXES = {".html", ".js", ".css", ".json", ".ndjson", ".svg", ".txt", ".xml"}
+COMPRESSIONS = (".gz", ".br")
+# Quality 11 saves 15% more on html pages but takes 30 times longer.
+BROTLI_QUALITY = 9
+# Files of this module, of entrypoint.sh, of sphinx and of ros_directives.py, never published.
+PRIVATE_FILES = {
+    MANIFEST,
+    CHANGED,
+    REMOVED,
+    ".build_fingerprint",
+    ".build_inputs",
+    ".buildinfo",
+    ".ros_outputs.json",
+}
+# Doctrees kept in the output directory when the action has no cache-root.
+PRIVATE_DIRS = {".doctrees"}
+
+
+def is_sibling(path: Path) -> bool:
+    """Return whether a file is a compressed sibling written by this module."""
+    return path.suffix in COMPRESSIONS and Path(path.stem).suffix in COMPRESSED_SUFFIXES
+
+
+def output_files(directory: Path) -> list[str]:
+    """Return the published files of a build directory, relative to it."""
+    files = []
+    for parent, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if name not in PRIVATE_DIRS]
+        for name in filenames:
+            path = Path(parent, name)
+            if name not in PRIVATE_FILES and not is_sibling(path) and path.is_file():
+                files.append(path.relative_to(directory).as_posix())
+    return sorted(files)
+
+
+def compress(path: Path, content: bytes, suffixes: tuple[str, ...], quality: int) -> None:
+    """Write the compressed siblings of a file, with the given brotli quality."""
+    for suffix in suffixes:
+        if suffix == ".gz":
+            # No timestamp so an unchanged file gives the same archive.
+            data = gzip.compress(content, compresslevel=9, mtime=0)
+        else:
+            import brotli  # noqa: PLC0415, optional dependency
+
+            data = brotli.compress(content, quality=quality)
+        # Replaced rather than written over, the sibling may be hardlinked to the one of
+        # another version by multi_version.py.
+        sibling = path.with_name(path.name + suffix)
+        temporary = sibling.with_name(f"{sibling.name}.publish")
+        temporary.write_bytes(data)
+        temporary.replace(sibling)
+
+
+def process_file(job: tuple[str, str | None, tuple[str, ...], int]) -> tuple[str, bool]:
+    """Return the sha256 of a file and whether it was compressed again, in a worker process."""
+    name, previous, suffixes, quality = job
+    path = Path(name)
+    content = path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    if path.suffix not in COMPRESSED_SUFFIXES:
+        return digest, False
+    missing = any(not path.with_name(path.name + suffix).is_file() for suffix in suffixes)
+    if digest != previous or missing:
+        compress(path, content, suffixes, quality)
+        return digest, True
+    return digest, False
+
+
+def publish(
+    directory: Path, jobs: int | None, quality: int = BROTLI_QUALITY
+) -> tuple[list[str], list[str], int]:
+    """Update the manifest and the siblings, return the changed and removed files."""
+    manifest = directory / MANIFEST
+    previous = {}
+    if manifest.is_file():
+        previous = json.loads(manifest.read_text(encoding="utf-8"))
+    suffixes = COMPRESSIONS if importlib.util.find_spec("brotli") else (".gz",)
+    names = output_files(directory)
+    work = [(str(directory / name), previous.get(name), suffixes, quality) for name in names]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(process_file, work, chunksize=64))
+
+    digests = {}
+    changed = []
+    compressed = 0
+    for name, (digest, recompressed) in zip(names, results, strict=True):
+        digests[name] = digest
+        compressed += recompressed
+        if digest != previous.get(name) or recompressed:
+            changed.append(name)
+            if recompressed:
+                changed += [name + suffix for suffix in suffixes]
+    removed = []
+    for name in sorted(previous.keys() - digests.keys()):
+        removed.append(name)
+        for suffix in COMPRESSIONS:
+            sibling = directory / (name + suffix)
+            if sibling.is_file():
+                sibling.unlink()
+                removed.append(name + suffix)
+
+    with manifest.open("w", encoding="utf-8") as output:
+        json.dump(digests, output, indent=1, sort_keys=True)
+    (directory / CHANGED).write_text("".join(f"{name}\n" for name in changed), encoding="utf-8")
+    (directory / REMOVED).write_text("".join(f"{name}\n" for name in removed), encoding="utf-8")
+    return changed, removed, compressed
+
+
+def main() -> int:
+    """Prepare the build directory given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("directory", type=Path, help="output directory of sphinx-build")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument(
+        "--brotli-quality", type=int, default=BROTLI_QUALITY, help="from 0 to 11, the smallest"
+    )
+    options = parser.parse_args()
+    start = time.perf_counter()
+    changed, removed, compressed = publish(options.directory, options.jobs, options.brotli_quality)
+    print(
+        f"publish_output: {len(changed)} files changed, {len(removed)} removed, "
+        f"{compressed} compressed in {time.perf_counter() - start:.1f} s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""Merge the ros registries of many documentation builds into a site-wide index.
+
+Every html build using ros_directives writes its registry in ``ros_registry.ndjson.gz``.
+This script merges these fragments, given as files or as directories searched for them,
+without building anything again::
+
+    python ext/ros_aggregate.py site build/org/repo_a/main build/org/repo_b/main
+    python ext/ros_aggregate.py site repo_c.ndjson.gz=https://docs.example.org/repo_c/
+
+The urls of a fragment are relative to the url given after ``=``, else to the
+``ros_fragment_base_url`` of its project, else to its directory. The output directory gets
+``index.html``, a table of every package with a search box over every ros object, its
+search index ``_static/ros_index.json``, ``ros_packages.json``, and the topics, services
+and actions joined across projects in ``ros_channels.json`` and ``ros_graph.svg``.
+
+Fragments are read in parallel processes, each writing its search entries sorted in a
+temporary file. These runs are then merged as streams, so the memory holds the packages,
+executables and channels but not every parameter and argument.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import heapq
+import json
+import os
+import pickle
+import posixpath
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit
+
+from ros_directives import FRAGMENT_FILE, FRAGMENT_VERSION, SEARCH_ANCHORS, SEARCH_KINDS
+from ros_graph import GRAPH_ROLES, graph_svg
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Kinds of the entities of an executable or a launch file, with the kind of their owner.
+OWNER_KINDS = {"parameter": "executable", "interface": "executable", "argument": "launch"}
+# Entries other entries refer to, by their position once merged.
+REFERRED_KINDS = {SEARCH_KINDS.index(kind) for kind in ("executable", "launch", "interface")}
+TYPE_KIND = SEARCH_KINDS.index("type")
+# Entries read, written or encoded at once.
+CHUNK_SIZE = 10000
+
+INDEX_HTML = """\
+<!DOCTYPE html>
+<html lang="en" data-content_root="">
+<head>
+<meta charset="utf-8">
+<title>ROS packages</title>
+<script src="_static/ros_search.js"></script>
+</head>
+<body>
+<h1>ROS packages</h1>
+<div class="ros-search"><input type="search" placeholder="Search ros objects and types"
+ aria-label="Search ros objects and types"><ul class="ros-search-results"></ul></div>
+<p><a href="ros_graph.svg">Connections of the executables</a>
+(<a href="ros_channels.json">json</a>)</p>
+<table>
+<thead><tr><th>Package</th><th>Project</th><th>Executables</th><th>Launch files</th>
+<th>Description</th></tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+
+def find_fragments(argument: str, output: Path) -> list[tuple[str, list[str]]]:
+    """Return the fragments of a command line argument, with their possible base urls."""
+    location, _, base_url = argument.partition("=")
+    path = Path(location)
+    paths = sorted(path.rglob(FRAGMENT_FILE)) if path.is_dir() else [path]
+    # Without any url, the fragment is published next to the output directory.
+    return [
+        (str(path), [base_url, Path(os.path.relpath(path.parent, output)).as_posix()])
+        for path in paths
+    ]
+
+
+def join_url(base_url: str, url: str) -> str:
+    """Return the url of a page of a fragment relative to its base url.
+
+    ``urljoin`` drops the leading ``..`` of a relative base such as ``../out/``, so relative
+    bases are joined as paths.
+    """
+    if urlsplit(base_url).scheme or base_url.startswith("/"):
+        return urljoin(base_url, url)
+    path, hash_, anchor = url.partition("#")
+    return posixpath.normpath(posixpath.join(base_url, path)) + hash_ + anchor
+
+
+def map_fragment(job: tuple[int, str, list[str], str]) -> dict:
+    """Read a fragment, write its search entries sorted in a run file and return the rest.
+
+    Run entries are ``[key, kind, fragment, sequence, name, page, owner, detail]``, the owner
+    being the sequence of the entry an entity or a type refers to.
+    """
+    number, path, base_urls, run_path = job
+    pages = {}
+    packages = {}
+    executables = []
+    channels = {}
+    entries = []
+    owners = {}
+
+    def page(url: str) -> int:
+        return pages.setdefault(join_url(base_url, url.partition("#")[0]), len(pages))
+
+    with gzip.open(path, "rt", encoding="utf-8") as fragment:
+        header = json.loads(next(fragment, "{}"))
+        if header.get("kind") != "fragment" or header.get("version") != FRAGMENT_VERSION:
+            msg = f"{path} is not a ros registry fragment of version {FRAGMENT_VERSION}"
+            raise ValueError(msg)
+        project = header["project"]
+        given, relative = base_urls
+        base_url = (given or header["base_url"] or relative).removesuffix("/") + "/"
+        for line in fragment:
+            record = json.loads(line)
+            kind = record["kind"]
+            url = record.get("url")
+            if kind == "package":
+                packages[record["name"]] = {
+                    "name": record["name"],
+                    "project": project,
+                    "description": record["description"],
+                    "url": url and join_url(base_url, url),
+                    "executables": 0,
+                    "launch": 0,
+                }
+            elif kind in {"executable", "launch"}:
+                packages[record["package"]]["executables" if kind == "executable" else kind] += 1
+            if kind == "executable":
+                executables.append(
+                    {
+                        "name": record["name"],
+                        "package": record["package"],
+                        "project": project,
+                        "url": url and join_url(base_url, url),
+                    }
+                )
+            elif kind == "interface":
+                channel_kind, provides = GRAPH_ROLES[record["category"]]
+                key = (channel_kind, record["name"], record["channel_type"])
+                channels.setdefault(key, ([], []))[0 if provides else 1].append(
+                    len(executables) - 1
+                )
+            if url is None:
+                continue
+            sequence = len(entries)
+            key = record["name"].lower()
+            if kind in OWNER_KINDS:
+                owner = owners.get((OWNER_KINDS[kind], record[OWNER_KINDS[kind]]))
+                if owner is None:
+                    continue
+                detail = record["category"] if kind == "interface" else record["type"] or ""
+                entry = [key, SEARCH_KINDS.index(kind), number, sequence, record["name"]]
+                entries.append([*entry, None, owner, detail])
+            else:
+                detail = "" if kind == "package" else record["package"]
+                entry = [key, SEARCH_KINDS.index(kind), number, sequence, record["name"]]
+                entries.append([*entry, page(url), None, detail])
+            if kind in {"executable", "launch"}:
+                owners[kind, record["name"]] = sequence
+            if kind == "interface":
+                types = {record["in_type"], record["out_type"], record["status_type"]}
+                for interface_type in sorted(types - {None, ""}):
+                    type_entry = [interface_type.lower(), TYPE_KIND, number, len(entries)]
+                    entries.append([*type_entry, interface_type, None, sequence, None])
+
+    entries.sort()
+    with open(run_path, "wb") as run:
+        for start in range(0, len(entries), CHUNK_SIZE):
+            pickle.dump(entries[start : start + CHUNK_SIZE], run, pickle.HIGHEST_PROTOCOL)
+    return {
+        "path": path,
+        "pages": list(pages),
+        "packages": list(packages.values()),
+        "executables": executables,
+        "channels": [[*key, *ends] for key, ends in channels.items()],
+        "run": run_path,
+    }
+
+
+def read_run(path: str) -> Iterator[list]:
+    """Yield the sorted entries of a run file, reading a chunk at a time."""
+    with open(path, "rb") as run:
+        while run.peek(1):
+            yield from pickle.load(run)
+
+
+def merge_search_index(fragments: list[dict], path: Path) -> int:
+    """Merge the runs of the fragments into the search index, return its number of entries.
+
+    The format is the one of ros_search, pages being urls. A first pass over the merged runs
+    finds the positions of the entries referred to, the second one writes the index.
+    """
+    page_offsets = []
+    pages = []
+    for fragment in fragments:
+        page_offsets.append(len(pages))
+        pages += fragment["pages"]
+    positions = {}
+    runs = [fragment["run"] for fragment in fragments]
+    for position, entry in enumerate(heapq.merge(*map(read_run, runs))):
+        if entry[1] in REFERRED_KINDS:
+            positions[entry[2], entry[3]] = position
+
+    count = 0
+    chunk = []
+
+    def write_chunk() -> None:
+        output.write("," if count > len(chunk) else "")
+        output.write(json.dumps(chunk, ensure_ascii=False, separators=(",", ":"))[1:-1])
+        chunk.clear()
+
+    with path.open("w", encoding="utf-8") as output:
+        header = {"kinds": SEARCH_KINDS, "anchors": SEARCH_ANCHORS, "pages": pages}
+        output.write(json.dumps(header, separators=(",", ":"))[:-1])
+        output.write(',"entries":[')
+        for _, kind, number, _, name, page, owner, detail in heapq.merge(*map(read_run, runs)):
+            if kind == TYPE_KIND:
+                chunk.append([name, kind, positions[number, owner]])
+            elif owner is not None:
+                chunk.append([name, kind, positions[number, owner], detail])
+            else:
+                chunk.append([name, kind, page_offsets[number] + page, detail])
+            count += 1
+            if len(chunk) == CHUNK_SIZE:
+                write_chunk()
+        if chunk:
+            write_chunk()
+        output.write("]}")
+    return count
+
+
+def merge_graph(fragments: list[dict]) -> dict:
+    """Join the channels of every fragment, in the format of ros_graph."""
+    executables = []
+    channels = {}
+    for fragment in fragments:
+        offset = len(executables)
+        executables += fragment["executables"]
+        for kind, name, types, providers, users in fragment["channels"]:
+            ends = channels.setdefault((kind, name, types), (set(), set()))
+            ends[0].update(offset + position for position in providers)
+            ends[1].update(offset + position for position in users)
+    return {
+        "executables": executables,
+        "channels": [
+            {
+                "kind": kind,
+                "name": name,
+                "type": types,
+                "providers": sorted(providers),
+                "users": sorted(users),
+            }
+            for (kind, name, types), (providers, users) in sorted(channels.items())
+        ],
+    }
+
+
+def package_row(package: dict) -> str:
+    """Return the row of a package in the table of index.html."""
+    name = escape(package["name"])
+    if package["url"]:
+        name = f'<a href="{escape(package["url"])}">{name}</a>'
+    cells = (
+        name,
+        escape(package["project"]),
+        str(package["executables"]),
+        str(package["launch"]),
+        escape(package["description"]),
+    )
+    return "<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>"
+
+
+def aggregate(output: Path, arguments: list[str], jobs: int | None) -> dict:
+    """Write the site-wide index of the fragments, return its counts."""
+    located = [fragment for argument in arguments for fragment in find_fragments(argument, output)]
+    static_dir = output / "_static"
+    static_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="ros_aggregate-") as temporary:
+        work = [
+            (number, path, base_urls, str(Path(temporary, f"{number}.ndjson")))
+            for number, (path, base_urls) in enumerate(located)
+        ]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            fragments = list(pool.map(map_fragment, work))
+        entries = merge_search_index(fragments, static_dir / "ros_index.json")
+    shutil.copyfile(
+        Path(__file__).parent / "static" / "ros_search.js", static_dir / "ros_search.js"
+    )
+
+    packages = []
+    projects = {}
+    for fragment in fragments:
+        for package in fragment["packages"]:
+            if package["name"] in projects:
+                print(
+                    f"ros_aggregate: package {package['name']} of {package['project']} also "
+                    f"in {projects[package['name']]}",
+                    file=sys.stderr,
+                )
+            projects.setdefault(package["name"], package["project"])
+            packages.append(package)
+    packages.sort(key=lambda package: (package["name"], package["project"]))
+    with (output / "ros_packages.json").open("w", encoding="utf-8") as json_output:
+        json.dump(packages, json_output, ensure_ascii=False, indent=1)
+    rows = "\n".join(package_row(package) for package in packages)
+    (output / "index.html").write_text(INDEX_HTML.format(rows=rows), encoding="utf-8")
+
+    graph = merge_graph(fragments)
+    with (output / "ros_channels.json").open("w", encoding="utf-8") as json_output:
+        json.dump(graph, json_output, ensure_ascii=False, separators=(",", ":"))
+    links = {exe["name"]: exe["url"] for exe in graph["executables"] if exe["url"]}
+    if graph["channels"]:
+        (output / "ros_graph.svg").write_text(graph_svg(graph, links), encoding="utf-8")
+    return {
+        "fragments": len(fragments),
+        "packages": len(packages),
+        "executables": len(graph["executables"]),
+        "channels": len(graph["channels"]),
+        "entries": entries,
+    }
+
+
+def main() -> int:
+    """Aggregate the fragments given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+    parser.add_argument("output", type=Path, help="output directory")
+    parser.add_argument(
+        "fragments", nargs="+", help="fragment or directory of fragments, optionally =base_url"
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    options = parser.parse_args()
+    start = time.perf_counter()
+    counts = aggregate(options.output.resolve(), options.fragments, options.jobs)
+    print(
+        "ros_aggregate: {fragments} fragments, {packages} packages, {executables} executables, "
+        "{channels} channels, {entries} search entries".format(**counts),
+        f"in {time.perf_counter() - start:.1f} s",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,37 +2,280 @@
 
 from __future__ import annotations
 
+import gzip
+import hashlib
+import html
+import json
+import pickle
+import re
+import sys
 from abc import abstractmethod
+from contextlib import nullcontext
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 from docutils import nodes
-from docutils.parsers.rst.directives import unchanged
-from sphinx.util.docutils import SphinxDirective, SphinxRole
+from docutils.parsers.rst.directives import flag, unchanged
+from ros_graph import channel_type, connect_interfaces, graph_svg, package_subgraph
+from ros_profile import merge_profile, profile_directive, profile_method, profiled, write_profile
+from ros_workspace import (
+    WorkspaceParseError,
+    cached_parse,
+    find_packages,
+    node_parameters,
+    parse_parameters_csv,
+    parse_parameters_yaml,
+    resolve_type,
+    scan_interfaces,
+    scan_package,
+    workspace_listing,
+)
+from sphinx import addnodes
+from sphinx.builders import Builder
+from sphinx.domains import Domain, ObjType
+from sphinx.roles import XRefRole
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util import logging
+from sphinx.util.docutils import SphinxDirective, SphinxTranslator
+from sphinx.util.fileutil import copy_asset_file
+from sphinx.util.matching import get_matching_files
+from sphinx.util.nodes import make_refnode
+from sphinx.util.osutil import FileAvoidWrite
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Set
+
+    from docutils.nodes import document
     from sphinx.application import Sphinx
+    from sphinx.config import Config
+    from sphinx.environment import BuildEnvironment
+
+logger = logging.getLogger(__name__)
+
+# Keys of the per-document context kept in ``env.temp_data`` while reading.
+CTX_PKG = "ros:pkg"
+CTX_EXEC = "ros:exec"
+# Directory of the html output holding the details loaded on demand.
+DETAILS_DIR = "_ros_details"
+# Files of the html output named after their content linked by each page.
+OUTPUTS_MANIFEST = ".ros_outputs.json"
+
+
+class ros_package(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Placeholder replaced by the package description once all documents are read."""
+
+
+class ros_entity(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Placeholder replaced by an executable or launch file description."""
+
+
+class ros_rendered(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Package rendered in html, its markup written again by the pages showing it the same way."""
+
+
+class ros_details(nodes.section):  # noqa: N801, docutils node naming
+    """Entities of an executable or launch file, loaded by the html pages when opened.
+
+    A section for the writers, which only render subtitles in sections.
+    """
+
+
+def get_ros_pkg(env: BuildEnvironment) -> dict[str, RosPackage]:
+    """Return the ros package registry stored in the build environment."""
+    if not hasattr(env, "ros_pkg"):
+        env.ros_pkg = {}
+    return env.ros_pkg
+
+
+def sorted_packages(ros_pkg: dict[str, RosPackage]) -> list[RosPackage]:
+    """Return the packages of the registry by name.
+
+    A package read again is inserted anew in the registry, so its order depends on the past
+    builds and not on the content.
+    """
+    return [ros_pkg[name] for name in sorted(ros_pkg)]
+
+
+def get_ros_rendered(builder: Builder) -> dict[tuple, str]:
+    """Return the html markup of the packages rendered by the build, by rendering key."""
+    if not hasattr(builder, "ros_rendered"):
+        builder.ros_rendered = {}
+    return builder.ros_rendered
+
+
+def get_ros_written(builder: Builder) -> set[str]:
+    """Return the documents written by the build."""
+    if not hasattr(builder, "ros_written"):
+        builder.ros_written = set()
+    return builder.ros_written
+
+
+def get_ros_shown(env: BuildEnvironment) -> dict[str, set[tuple[str, str]]]:
+    """Return the (kind, name) of the ros objects shown by each document.
+
+    Kinds are ``pkg`` for a package rendered whole, ``toc`` for a package whose executables and
+    launch files have their own page, ``exec`` and ``launch`` for these pages, ``graph`` and
+    ``types`` for the connection graph and the interface types of a package, or of every
+    package when the name is empty.
+    """
+    if not hasattr(env, "ros_pkg_shown"):
+        env.ros_pkg_shown = {}
+    return env.ros_pkg_shown
+
+
+def get_ros_changes(env: BuildEnvironment) -> tuple[set[str], dict[str, RosPackage]]:
+    """Return the packages (re)declared or removed since the last update, and their old state."""
+    if not hasattr(env, "ros_pkg_changed"):
+        env.ros_pkg_changed = set()
+        env.ros_pkg_previous = {}
+    return env.ros_pkg_changed, env.ros_pkg_previous
+
+
+def get_ros_ws_cache(env: BuildEnvironment) -> dict[str, tuple]:
+    """Return the parse results of the ros workspace files, indexed by file path."""
+    if not hasattr(env, "ros_ws_cache"):
+        env.ros_ws_cache = {}
+    return env.ros_ws_cache
+
+
+def get_ros_ws_listing(env: BuildEnvironment) -> dict[str, dict[str, str]]:
+    """Return the listing digest of the workspaces declared by each document, by root path."""
+    if not hasattr(env, "ros_ws_listing"):
+        env.ros_ws_listing = {}
+    return env.ros_ws_listing
+
 
-ros_pkg = {}
-ros_exec = {}
-ACT_PKG = None
-ACT_EXEC = None
+def get_ros_types(env: BuildEnvironment) -> dict[str, dict]:
+    """Return the interface types defined in ``ros_interface_dirs``, indexed by full name."""
+    if not hasattr(env, "ros_types"):
+        env.ros_types = {}
+    return env.ros_types
+
+
+def get_ros_types_cache(env: BuildEnvironment) -> dict[str, tuple]:
+    """Return the parse results of the interface definition files, indexed by file path."""
+    if not hasattr(env, "ros_types_cache"):
+        env.ros_types_cache = {}
+    return env.ros_types_cache
+
+
+def get_ros_graph(env: BuildEnvironment) -> dict:
+    """Return the connection graph of the executables, kept until a package changes."""
+    if getattr(env, "ros_graph", None) is None:
+        env.ros_graph = connect_interfaces(get_ros_pkg(env))
+    return env.ros_graph
+
+
+def get_ros_exec(env: BuildEnvironment) -> dict[str, RosExec]:
+    """Return every executable of the registry indexed by name."""
+    return {
+        name: executable
+        for pkg in sorted_packages(get_ros_pkg(env))
+        for name, executable in pkg.executables.items()
+    }
+
+
+def intern(value: str | None) -> str | None:
+    """Intern the strings repeated across the registry, such as types and categories."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Compact:
+    """Base of the registry classes, stored in slots and pickled as a plain tuple."""
+
+    __slots__ = ()
+
+    @classmethod
+    def fields(cls) -> tuple[str, ...]:
+        """Return the slots of the class and of its parents, in a stable order."""
+        return tuple(
+            slot for klass in reversed(cls.__mro__) for slot in vars(klass).get("__slots__", ())
+        )
+
+    def __getstate__(self) -> tuple:
+        """Return the slot values."""
+        return tuple(getattr(self, field) for field in self.fields())
+
+    def __setstate__(self, state: tuple) -> None:
+        """Restore the slot values, interning the strings as the constructors do.
+
+        Otherwise the records read again after loading the environment hold their own copies,
+        pickled along with the loaded ones.
+        """
+        for field, value in zip(self.fields(), state, strict=True):
+            setattr(self, field, intern(value))
+
+    def state(self) -> tuple:
+        """Return the slot values as ``__getstate__``, the registry objects held as their state."""
+        return tuple(plain_state(value) for value in self.__getstate__())
+
+
+def plain_state(value: object) -> object:
+    """Return a value with its registry objects replaced by their state, for comparisons."""
+    if isinstance(value, Compact):
+        return value.state()
+    if isinstance(value, list | tuple):
+        return tuple(plain_state(item) for item in value)
+    if isinstance(value, dict):
+        # In order, the order of the entries being rendered.
+        return tuple((key, plain_state(item)) for key, item in value.items())
+    return value
 
 
 def create_table_row(title: str, *cases) -> nodes.Node:
-    """Create a row within a table in the doc."""
+    """Create a row within a table in the doc, cases being text or inline nodes."""
     in_row = nodes.row()
-    in_row.append(nodes.entry("", nodes.paragraph("", text=f"{title}")))
-    for case in cases:
-        in_row.append(nodes.entry("", nodes.paragraph("", text=f"{case}")))
+    for case in (title, *cases):
+        if isinstance(case, nodes.Node):
+            in_row.append(nodes.entry("", nodes.paragraph("", "", case)))
+        else:
+            in_row.append(nodes.entry("", nodes.paragraph("", text=f"{case}")))
     return in_row
 
 
-class Param:
+def type_reference(type_name: str, target: str | None) -> nodes.Node | str:
+    """Link a type to its definition through the ros domain, kept as text if not shown.
+
+    Types defined elsewhere, such as ``std_msgs``, are kept as text without any warning, even
+    when nitpicky, see ``keep_unshown_types``.
+    """
+    if target is None:
+        return type_name
+    return addnodes.pending_xref(
+        "",
+        nodes.inline("", type_name),
+        refdomain="ros",
+        reftype="type",
+        reftarget=target,
+        refexplicit=True,
+        ros_optional=True,
+    )
+
+
+def keep_unshown_types(
+    app: Sphinx, domain: Domain | None, node: addnodes.pending_xref
+) -> bool | None:
+    """Do not warn about the types linked by the extension whose definition is not shown."""
+    return True if node.get("ros_optional") else None
+
+
+def create_table(titles: tuple[str, ...], rows: list[nodes.row]) -> nodes.table:
+    """Create a table with a header row, holding the rows of many parameters or interfaces."""
+    group = nodes.tgroup("", cols=len(titles))
+    group.extend(nodes.colspec("", colwidth=2) for _ in titles)
+    group.append(nodes.thead("", create_table_row(*titles)))
+    group.append(nodes.tbody("", *rows))
+    return nodes.table("", group)
+
+
+class Param(Compact):
     """Parameters used in ros executables."""
 
+    __slots__ = ("name", "param_type", "default", "description")
+
     def __init__(self, name, param_type=None, default=None, description=None):
         self.name = name
-        self.param_type = param_type
+        self.param_type = intern(param_type)
         self.default = default
         self.description = description
 
@@ -52,10 +295,28 @@ class Param:
         )
         return param_descr
 
+    def show_row(self, ids):
+        """Render a param as a row of the table of every param of an executable."""
+        row = create_table_row(self.name, self.param_type, self.default, self.description)
+        row["ids"] = ids
+        return row
+
 
-class Interface:
+class Interface(Compact):
     """Describe an in and out interface."""
 
+    __slots__ = (
+        "name",
+        "category",
+        "descr",
+        "in_type",
+        "in_descr",
+        "out_type",
+        "out_descr",
+        "status_type",
+        "status_descr",
+    )
+
     def __init__(
         self,
         name,
@@ -69,13 +330,13 @@ class Interface:
         status_descr,
     ):
         self.name = name
-        self.category = category
+        self.category = intern(category)
         self.descr = descr
-        self.in_type = in_type
+        self.in_type = intern(in_type)
         self.in_descr = in_descr
-        self.out_type = out_type
+        self.out_type = intern(out_type)
         self.out_descr = out_descr
-        self.status_type = status_type
+        self.status_type = intern(status_type)
         self.status_descr = status_descr
 
     def show(self):
@@ -93,90 +354,90 @@ class Interface:
         param_descr.append(table_descr)
         return param_descr
 
-    @abstractmethod
+    def show_rows(self, ids):
+        """Render the interface as rows of the table of every interface of an executable."""
+        rows = self.get_description()
+        first = rows[0]
+        first["ids"] = ids
+        for index, case in enumerate((self.name, self.category)):
+            first.insert(
+                index,
+                nodes.entry("", nodes.paragraph("", text=case), morerows=len(rows) - 1),
+            )
+        return rows
+
     def get_description(self):
         """Get description."""
+        return [
+            create_table_row(
+                title,
+                type_reference(interface_type, resolve_type(interface_type))
+                if interface_type is not None
+                else "-",
+                descr if descr is not None else "-",
+            )
+            for title, interface_type, descr in self.get_lines()
+        ]
+
+    @abstractmethod
+    def get_lines(self):
+        """Get the title, type and description of each line of the interface."""
         ...
 
 
 class TopicIn(Interface):
     """Descrpiton class for topic in."""
 
-    def get_description(self):
+    __slots__ = ()
+
+    def get_lines(self):
         """Return the line corresponding to the in parameter of the topic."""
-        in_row = create_table_row(
-            "In",
-            self.in_type if self.in_type is not None else "-",
-            self.in_descr if self.in_descr is not None else "-",
-        )
-        return [in_row]
+        return [("In", self.in_type, self.in_descr)]
 
 
 class TopicOut(Interface):
     """Descrpiton class for topic out."""
 
-    def get_description(self):
+    __slots__ = ()
+
+    def get_lines(self):
         """Return the line corresponding to the out parameter of the topic."""
-        out_row = create_table_row(
-            "Out",
-            self.out_type if self.out_type is not None else "-",
-            self.out_descr if self.out_descr is not None else "-",
-        )
-        return [out_row]
+        return [("Out", self.out_type, self.out_descr)]
 
 
 class Service(Interface):
     """Descrpiton class for service."""
 
-    def get_description(self):
-        """Return the line corresponding to the out parameter of the topic."""
-        in_row = create_table_row(
-            "In",
-            self.in_type if self.in_type is not None else "-",
-            self.in_descr if self.in_descr is not None else "-",
-        )
+    __slots__ = ()
 
-        out_row = create_table_row(
-            "Out",
-            self.out_type if self.out_type is not None else "-",
-            self.out_descr if self.out_descr is not None else "-",
-        )
-        return [in_row, out_row]
+    def get_lines(self):
+        """Return the line corresponding to the out parameter of the topic."""
+        return [("In", self.in_type, self.in_descr), ("Out", self.out_type, self.out_descr)]
 
 
 class Action(Interface):
     """Descrpiton class for action."""
 
-    def get_description(self):
-        """Return the line corresponding to the out parameter of the topic."""
-        request_row = create_table_row(
-            "Request",
-            self.in_type if self.in_type is not None else "-",
-            self.in_descr if self.in_descr is not None else "-",
-        )
-
-        result_row = create_table_row(
-            "Result",
-            self.out_type if self.out_type is not None else "-",
-            self.out_descr if self.out_descr is not None else "-",
-        )
+    __slots__ = ()
 
-        status_row = create_table_row(
-            "Status",
-            self.status_type if self.status_type is not None else "-",
-            self.status_descr if self.status_descr is not None else "-",
-        )
-        return [request_row, result_row, status_row]
+    def get_lines(self):
+        """Return the line corresponding to the out parameter of the topic."""
+        return [
+            ("Request", self.in_type, self.in_descr),
+            ("Result", self.out_type, self.out_descr),
+            ("Status", self.status_type, self.status_descr),
+        ]
 
 
-class RosExec:
+class RosExec(Compact):
     """Ros executable."""
 
+    __slots__ = ("name", "loc", "short_descr", "long_descr", "params", "interfaces")
+
     def __init__(self, name, loc=None, short_descr=None, long_descr=None):
-        ros_exec[name] = self
         self.name = name
         self.loc = loc
-        self.short_descr = (short_descr,)
+        self.short_descr = short_descr
         self.long_descr = long_descr
         self.params = []
         self.interfaces = []
@@ -234,8 +495,12 @@ class RosExec:
         code_block.append(nodes.inline(text=f"{exemple_config}"))
         return code_block
 
-    def show(self):
-        """Render the Ros executable in the doc."""
+    def show(self, compact=False, lazy=False):
+        """Render the Ros executable in the doc.
+
+        When compact, the parameters and the interfaces are each rendered in a single table.
+        When lazy, they are in details loaded by the html pages when opened.
+        """
         root = nodes.section(ids=[f"exec_{self.name}"])
         title = nodes.title("", f"{self.name} [Executable]")
         root.append(title)
@@ -243,36 +508,65 @@ class RosExec:
         root.append(descr)
         params_list_title = nodes.subtitle("", "Parameters description")
         root.append(params_list_title)
-        params_list = nodes.field_list()
-        for arg in self.params:
-            params_list.append(
-                nodes.field(
-                    "", nodes.field_name("", f"{arg.name}"), nodes.field_body("", arg.show())
+        if compact:
+            if self.params:
+                root.append(
+                    create_table(
+                        ("Name", "Type", "Default", "Description"),
+                        [arg.show_row([f"param_{self.name}_{arg.name}"]) for arg in self.params],
+                    )
                 )
-            )
-        root.append(params_list)
-        exec_used_title = nodes.subtitle("", "Interfaces description")
-        root.append(exec_used_title)
-        interfaces_list = nodes.field_list()
-        for interface in self.interfaces:
-            interfaces_list.append(
-                nodes.field(
-                    "",
-                    nodes.field_name("", f"{interface.name} [{interface.category}]"),
-                    nodes.field_body("", interface.show()),
+            root.append(nodes.subtitle("", "Interfaces description"))
+            if self.interfaces:
+                rows = []
+                for interface in self.interfaces:
+                    rows += interface.show_rows([f"interface_{self.name}_{interface.name}"])
+                root.append(create_table(("Name", "Category", "", "Type", "Description"), rows))
+        else:
+            params_list = nodes.field_list()
+            for arg in self.params:
+                params_list.append(
+                    nodes.field(
+                        "",
+                        nodes.field_name("", f"{arg.name}", ids=[f"param_{self.name}_{arg.name}"]),
+                        nodes.field_body("", arg.show()),
+                    )
+                )
+            root.append(params_list)
+            exec_used_title = nodes.subtitle("", "Interfaces description")
+            root.append(exec_used_title)
+            interfaces_list = nodes.field_list()
+            for interface in self.interfaces:
+                interfaces_list.append(
+                    nodes.field(
+                        "",
+                        nodes.field_name(
+                            "",
+                            f"{interface.name} [{interface.category}]",
+                            ids=[f"interface_{self.name}_{interface.name}"],
+                        ),
+                        nodes.field_body("", interface.show()),
+                    )
                 )
+            root.append(interfaces_list)
+        if lazy:
+            defer_details(
+                root,
+                f"{len(self.params)} parameters, {len(self.interfaces)} interfaces",
+                [f"param_{self.name}_", f"interface_{self.name}_"],
             )
-        root.append(interfaces_list)
         return root
 
 
-class RosLaunch:
+class RosLaunch(Compact):
     """Ros launch."""
 
+    __slots__ = ("name", "loc", "short_descr", "long_descr", "args", "exec_used")
+
     def __init__(self, name, loc, short_descr, long_descr, exec_used=None):
         self.name = name
         self.loc = loc
-        self.short_descr = (short_descr,)
+        self.short_descr = short_descr
         self.long_descr = long_descr
         self.args = []
         self.exec_used = exec_used if exec_used is not None else []
@@ -283,10 +577,14 @@ class RosLaunch:
 
     def add_exec(self, exec_name):
         """Add an executable used in the launch file."""
-        self.exec_used.append(ros_exec[exec_name])
+        self.exec_used.append(exec_name)
 
-    def show(self):
-        """Render the launch file documentation."""
+    def show(self, ros_exec, compact=False, lazy=False):
+        """Render the launch file documentation.
+
+        When compact, the arguments are rendered in a single table.
+        When lazy, the arguments and executables are in details loaded by the html pages.
+        """
         root = nodes.section(ids=[f"launch_{self.name}"])
         title = nodes.title("", f"{self.name} [Launch file]")
         root.append(title)
@@ -294,14 +592,25 @@ class RosLaunch:
         root.append(descr)
         args_list_title = nodes.subtitle("", "Arguments description")
         root.append(args_list_title)
-        args_list = nodes.field_list()
-        for arg in self.args:
-            args_list.append(
-                nodes.field(
-                    "", nodes.field_name("", f"{arg.name}"), nodes.field_body("", arg.show())
+        if compact:
+            if self.args:
+                root.append(
+                    create_table(
+                        ("Name", "Type", "Default", "Description"),
+                        [arg.show_row([f"arg_{self.name}_{arg.name}"]) for arg in self.args],
+                    )
                 )
-            )
-        root.append(args_list)
+        else:
+            args_list = nodes.field_list()
+            for arg in self.args:
+                args_list.append(
+                    nodes.field(
+                        "",
+                        nodes.field_name("", f"{arg.name}", ids=[f"arg_{self.name}_{arg.name}"]),
+                        nodes.field_body("", arg.show()),
+                    )
+                )
+            root.append(args_list)
         exec_used_title = nodes.subtitle("", "Executable used in launch file")
         root.append(exec_used_title)
         exec_list = nodes.bullet_list()
@@ -310,21 +619,30 @@ class RosLaunch:
                 executable = ros_exec[executable]  # noqa: PLW2901, ok in this context
                 exec_list.append(
                     nodes.list_item(
-                        "", nodes.paragraph("", f"{executable.name}: {executable.short_descr[0]}")
+                        "", nodes.paragraph("", f"{executable.name}: {executable.short_descr}")
                     )
                 )
             else:
                 exec_list.append(nodes.list_item("", nodes.paragraph("", f"{executable}")))
         root.append(exec_list)
+        if lazy:
+            defer_details(
+                root,
+                f"{len(self.args)} arguments, {len(self.exec_used)} executables",
+                [f"arg_{self.name}_"],
+            )
         return root
 
 
-class RosPackage:
+class RosPackage(Compact):
     """Ros package."""
 
-    def __init__(self, name: str, description: str = "") -> None:
+    __slots__ = ("name", "description", "docname", "executables", "launch")
+
+    def __init__(self, name: str, description: str = "", docname: str = "") -> None:
         self.name = name
         self.description = description
+        self.docname = docname
         self.executables = {}
         self.launch = {}
 
@@ -344,8 +662,13 @@ class RosPackage:
             exec_used=exec_used,
         )
 
-    def show(self):
-        """Render the package description in the documentation."""
+    def show(self, ros_exec, compact=False, split=False, lazy=False):
+        """Render the package description in the documentation.
+
+        When compact, each executable and launch file renders its entities in single tables.
+        When split, executables and launch files are only listed, linking to their own page.
+        When lazy, the html pages load the entities of an executable or launch file on demand.
+        """
         root = nodes.section(ids=[f"pkg_{self.name}"])
         title = nodes.title("", f"{self.name} [Ros package]", color="red")
         toc_list = nodes.bullet_list()
@@ -355,117 +678,196 @@ class RosPackage:
         exec_list_title = nodes.subtitle("", "Executable files description")
         exec_list = nodes.paragraph()
         for executable in self.executables.values():
-            toc_exec_list.append(
-                nodes.list_item(
-                    "",
-                    nodes.paragraph(
-                        "",
-                        "",
-                        nodes.reference(
-                            "",
-                            "",
-                            nodes.paragraph(text=f"{executable.name}: {executable.short_descr[0]}"),
-                            refid=f"exec_{executable.name}",
-                        ),
-                    ),
-                )
-            )
-            exec_list.append(executable.show())
+            toc_exec_list.append(toc_item("exec", executable, split))
+            if not split:
+                exec_list.append(executable.show(compact, lazy))
         launch_list_title = nodes.subtitle("", "Launch files description")
         launch_list = nodes.paragraph()
         for launch in self.launch.values():
-            toc_launch_list.append(
-                nodes.list_item(
-                    "",
-                    nodes.paragraph(
-                        "",
-                        "",
-                        nodes.reference(
-                            "",
-                            "",
-                            nodes.paragraph(text=f"{launch.name}: {launch.short_descr[0]}"),
-                            refid=f"launch_{launch.name}",
-                        ),
-                    ),
-                )
-            )
-            launch_list.append(launch.show())
+            toc_launch_list.append(toc_item("launch", launch, split))
+            if not split:
+                launch_list.append(launch.show(ros_exec, compact, lazy))
         toc_list.append(toc_exec_list)
         toc_list.append(toc_launch_list)
         root.append(title)
         root.append(descr)
         root.append(nodes.subtitle("", "Table of content"))
         root.append(toc_list)
+        if split:
+            return root
         root.append(exec_list_title)
         root.append(exec_list)
         root.append(launch_list_title)
         root.append(launch_list)
         return root
 
+    def toc_summary(self) -> tuple:
+        """Return what the table of content of the package shows."""
+        return (
+            self.name,
+            self.description,
+            tuple((exe.name, exe.short_descr) for exe in self.executables.values()),
+            tuple((launch.name, launch.short_descr) for launch in self.launch.values()),
+        )
+
+
+def defer_details(section: nodes.section, summary: str, prefixes: list[str]) -> None:
+    """Move what follows the title and the description of a section into a ros_details node.
+
+    The prefixes are those of the ids in the details, so a link to one of them opens them.
+    """
+    details = ros_details(summary=summary, prefixes=prefixes)
+    details.extend(section.children[2:])
+    del section[2:]
+    section.append(details)
+
+
+def toc_item(kind: str, entity: RosExec | RosLaunch, split: bool) -> nodes.list_item:
+    """Create the table of content entry of an executable or launch file of a package.
+
+    Split packages link to the page of the entity, resolved through the ros domain.
+    """
+    label = nodes.paragraph(text=f"{entity.name}: {entity.short_descr}")
+    if split:
+        link = addnodes.pending_xref(
+            "", label, refdomain="ros", reftype=kind, reftarget=entity.name, refexplicit=True
+        )
+    else:
+        link = nodes.reference("", "", label, refid=f"{kind}_{entity.name}")
+    return nodes.list_item("", nodes.paragraph("", "", link))
+
+
+class RosDirective(SphinxDirective):
+    """Base of the declaration directives, reporting mistakes with their location."""
+
+    # Options the directive needs, a missing one is reported and taken as empty.
+    required_options: tuple[str, ...] = ()
 
-class DeclarePackage(SphinxDirective):
+    def report(self, *problems: str) -> bool:
+        """Warn about each problem of the directive, return whether there was any."""
+        for problem in problems:
+            logger.warning("%s: %s", self.name, problem, location=self.get_location())
+        return bool(problems)
+
+    def check_options(self) -> None:
+        """Report the missing required options and take them as empty."""
+        for option in self.required_options:
+            if option not in self.options:
+                self.report(f"missing option :{option}:")
+                self.options[option] = ""
+
+    def current_package(self) -> RosPackage | None:
+        """Return the package being declared, None outside of begin_ros_pkg."""
+        return get_ros_pkg(self.env).get(self.env.temp_data.get(CTX_PKG))
+
+    def current_exec(self) -> RosExec | None:
+        """Return the executable being declared, None outside of begin_ros_exec."""
+        pkg = self.current_package()
+        return pkg.executables.get(self.env.temp_data.get(CTX_EXEC)) if pkg else None
+
+    def current_launch(self) -> RosLaunch | None:
+        """Return the launch file being declared, None outside of begin_ros_launch."""
+        pkg = self.current_package()
+        return pkg.launch.get(self.env.temp_data.get(CTX_EXEC)) if pkg else None
+
+
+class DeclarePackage(RosDirective):
     """Sphinx directive to declare a ros package."""
 
     required_arguments = 1
     option_spec = {"description": unchanged}
+    required_options = ("description",)
 
     def run(self) -> list[nodes.Node]:
-        """Create a pck in global variables."""
-        global ACT_PKG
-        ACT_PKG = self.arguments[0]
-        ros_pkg[self.arguments[0]] = RosPackage(
-            name=self.arguments[0], description=self.options["description"]
+        """Create a pck in the environment registry."""
+        self.check_options()
+        name = self.arguments[0]
+        if self.env.temp_data.get(CTX_PKG):
+            self.report(f"package {self.env.temp_data[CTX_PKG]} is not ended by end_ros_pkg")
+        previous = get_ros_pkg(self.env).get(name)
+        if previous is not None:
+            self.report(f"package {name} already declared in {previous.docname}")
+        self.env.temp_data[CTX_PKG] = name
+        self.env.temp_data[CTX_EXEC] = None
+        get_ros_changes(self.env)[0].add(name)
+        get_ros_pkg(self.env)[name] = RosPackage(
+            name=name,
+            description=self.options["description"],
+            docname=self.env.docname,
         )
         return []
 
 
-class EndPackage(SphinxDirective):
+class EndPackage(RosDirective):
     """Sphinx directive to declare a ros package."""
 
     def run(self) -> list[nodes.Node]:
         """End the description of the current package."""
-        global ACT_PKG
-        ACT_PKG = None
+        if not self.env.temp_data.get(CTX_PKG):
+            self.report("no package declared by begin_ros_pkg")
+        if self.env.temp_data.get(CTX_EXEC):
+            self.report(f"{self.env.temp_data[CTX_EXEC]} is not ended")
+        self.env.temp_data[CTX_PKG] = None
+        self.env.temp_data[CTX_EXEC] = None
         return []
 
 
-class DeclareExec(SphinxDirective):
+class DeclareExec(RosDirective):
     """Declare a new executable in the current package."""
 
     required_arguments = 1
     option_spec = {"short_descr": unchanged, "long_descr": unchanged}
+    required_options = ("short_descr", "long_descr")
 
     def run(self) -> list[nodes.Node]:
         """Declare an executable."""
-        global ACT_EXEC
-        ACT_EXEC = self.arguments[0]
-        ros_pkg[ACT_PKG].add_exec(
-            exec_name=ACT_EXEC,
+        self.check_options()
+        pkg = self.current_package()
+        if pkg is None:
+            self.report("outside of begin_ros_pkg")
+            return []
+        if self.env.temp_data.get(CTX_EXEC):
+            self.report(f"{self.env.temp_data[CTX_EXEC]} is not ended")
+        if self.arguments[0] in pkg.executables:
+            self.report(f"executable already declared in package {pkg.name}")
+        self.env.temp_data[CTX_EXEC] = self.arguments[0]
+        pkg.add_exec(
+            exec_name=self.arguments[0],
             short_descr=self.options["short_descr"],
             long_descr=self.options["long_descr"],
         )
         return []
 
 
-class EndExec(SphinxDirective):
+class EndExec(RosDirective):
     """Sphinx directive to declare a ros package."""
 
     def run(self) -> list[nodes.Node]:
         """End the current executable description."""
-        global ACT_EXEC
-        ACT_EXEC = None
+        if not self.env.temp_data.get(CTX_EXEC):
+            self.report("no executable or launch file to end")
+        self.env.temp_data[CTX_EXEC] = None
         return []
 
 
-class DeclareParam(SphinxDirective):
+class DeclareParam(RosDirective):
     """A directive to describe a parameter of an executable."""
 
     required_arguments = 1
     option_spec = {"type": unchanged, "default": unchanged, "description": unchanged}
+    required_options = ("type", "default", "description")
 
     def run(self) -> list[nodes.Node]:
         """Declare a parameter in the current context, should be executable."""
-        ros_pkg[ACT_PKG].executables[ACT_EXEC].add_param(
+        self.check_options()
+        executable = self.current_exec()
+        if executable is None:
+            self.report("outside of begin_ros_exec")
+            return []
+        if any(param.name == self.arguments[0] for param in executable.params):
+            self.report(f"parameter already declared in executable {executable.name}")
+            return []
+        executable.add_param(
             name=self.arguments[0],
             param_type=self.options["type"],
             default=self.options["default"],
@@ -474,7 +876,67 @@ class DeclareParam(SphinxDirective):
         return []
 
 
-class DeclareInterface(SphinxDirective):
+# Parser of each kind of parameter file accepted by declare_ros_parameters_from.
+PARAMETER_FILE_PARSERS = {
+    ".yaml": parse_parameters_yaml,
+    ".yml": parse_parameters_yaml,
+    ".csv": parse_parameters_csv,
+}
+
+
+class DeclareParamsFrom(RosDirective):
+    """Declare the parameters of the current executable from a parameter file."""
+
+    required_arguments = 1
+    option_spec = {"node": unchanged}
+
+    def run(self) -> list[nodes.Node]:
+        """Declare every parameter of the file, parsed again only when it changed."""
+        executable = self.current_exec()
+        if executable is None:
+            self.report("outside of begin_ros_exec")
+            return []
+        path = Path(self.env.relfn2path(self.arguments[0])[1])
+        parser = PARAMETER_FILE_PARSERS.get(path.suffix.lower())
+        if parser is None:
+            self.report(f"{path.name} is not a .yaml, .yml or .csv file")
+            return []
+        if not path.is_file():
+            self.report(f"parameter file {path} not found")
+            return []
+        self.env.note_dependency(str(path))
+        try:
+            nodes_params = cached_parse(get_ros_ws_cache(self.env), path, parser)
+        except WorkspaceParseError as exc:
+            self.report(str(exc))
+            return []
+        node_name = self.options.get("node", executable.name)
+        params = node_parameters(nodes_params, node_name)
+        if params is None:
+            self.report(f"no parameters of node {node_name} in {path.name}")
+            return []
+        declared = {param.name for param in executable.params}
+        for param in params:
+            if param["name"] in declared:
+                self.report(
+                    f"parameter {param['name']} already declared in executable {executable.name}"
+                )
+                continue
+            declared.add(param["name"])
+            executable.add_param(
+                name=param["name"],
+                param_type=param["type"],
+                default=param["default"],
+                description=param["description"],
+            )
+        return []
+
+
+# Categories of interface accepted by declare_ros_interface.
+INTERFACE_CATEGORIES = ("topic in", "topic out", "service in", "service out", "action")
+
+
+class DeclareInterface(RosDirective):
     """A directive to add an interface into an executable."""
 
     required_arguments = 1
@@ -488,13 +950,29 @@ class DeclareInterface(SphinxDirective):
         "status_type": unchanged,
         "status_description": unchanged,
     }
+    required_options = ("description", "category")
 
     def run(self) -> list[nodes.Node]:
         """Declare an interface in the current context."""
+        self.check_options()
         for option in self.option_spec:
             if option not in self.options:
                 self.options[option] = None
-        ros_exec[ACT_EXEC].add_interface(
+        executable = self.current_exec()
+        if executable is None:
+            self.report("outside of begin_ros_exec")
+            return []
+        if self.options["category"] not in INTERFACE_CATEGORIES:
+            if self.options["category"]:
+                self.report(
+                    f"unknown category {self.options['category']!r},"
+                    f" expected one of {', '.join(INTERFACE_CATEGORIES)}"
+                )
+            return []
+        if any(interface.name == self.arguments[0] for interface in executable.interfaces):
+            self.report(f"interface already declared in executable {executable.name}")
+            return []
+        executable.add_interface(
             self.arguments[0],
             self.options["description"],
             self.options["category"],
@@ -513,7 +991,7 @@ def str_option_to_list(options: str) -> list[str]:
     return [x.replace(" ", "") for x in options.split(",")]
 
 
-class DeclareLaunch(SphinxDirective):
+class DeclareLaunch(RosDirective):
     """Declare a new launch in the current package."""
 
     required_arguments = 1
@@ -522,29 +1000,47 @@ class DeclareLaunch(SphinxDirective):
         "long_descr": unchanged,
         "exec_used": str_option_to_list,
     }
+    required_options = ("short_descr", "long_descr")
 
     def run(self) -> list[nodes.Node]:
         """Declare a new launch file."""
-        global ACT_EXEC
-        ACT_EXEC = self.arguments[0]
-        ros_pkg[ACT_PKG].add_launch(
-            exec_name=ACT_EXEC,
+        self.check_options()
+        pkg = self.current_package()
+        if pkg is None:
+            self.report("outside of begin_ros_pkg")
+            return []
+        if self.env.temp_data.get(CTX_EXEC):
+            self.report(f"{self.env.temp_data[CTX_EXEC]} is not ended")
+        if self.arguments[0] in pkg.launch:
+            self.report(f"launch file already declared in package {pkg.name}")
+        self.env.temp_data[CTX_EXEC] = self.arguments[0]
+        pkg.add_launch(
+            exec_name=self.arguments[0],
             short_descr=self.options["short_descr"],
             long_descr=self.options["long_descr"],
-            exec_used=self.options["exec_used"],
+            exec_used=self.options.get("exec_used"),
         )
         return []
 
 
-class DeclareArg(SphinxDirective):
+class DeclareArg(RosDirective):
     """A directive to describe a parameter of an executable."""
 
     required_arguments = 1
     option_spec = {"type": unchanged, "default": unchanged, "description": unchanged}
+    required_options = ("type", "default", "description")
 
     def run(self) -> list[nodes.Node]:
         """Declare a new argument in the context, should be launch file."""
-        ros_pkg[ACT_PKG].launch[ACT_EXEC].add_arg(
+        self.check_options()
+        launch = self.current_launch()
+        if launch is None:
+            self.report("outside of begin_ros_launch")
+            return []
+        if any(arg.name == self.arguments[0] for arg in launch.args):
+            self.report(f"argument already declared in launch file {launch.name}")
+            return []
+        launch.add_arg(
             name=self.arguments[0],
             param_type=self.options["type"],
             default=self.options["default"],
@@ -553,65 +1049,1488 @@ class DeclareArg(SphinxDirective):
         return []
 
 
+def package_placeholder(directive: SphinxDirective, pkg_name: str) -> ros_package:
+    """Create the placeholder of a package shown by a directive."""
+    split = "split" in directive.options or directive.config.ros_split_pages
+    node = ros_package(
+        pkg_name=pkg_name,
+        compact="compact" in directive.options,
+        split=split,
+        lazy="lazy" in directive.options,
+    )
+    directive.set_source_info(node)
+    shown = get_ros_shown(directive.env).setdefault(directive.env.docname, set())
+    shown.add(("toc" if split else "pkg", pkg_name))
+    return node
+
+
+class DeclareWorkspace(SphinxDirective):
+    """Declare every package found in a ros workspace, without executing any of its files."""
+
+    required_arguments = 1
+    option_spec = {"show": flag, "compact": flag, "split": flag, "lazy": flag}
+
+    def run(self) -> list[nodes.Node]:
+        """Scan the workspace and declare its packages."""
+        root = Path(self.env.relfn2path(self.arguments[0])[1])
+        if not root.is_dir():
+            logger.warning("ros workspace %s not found", root, location=self.get_location())
+            return []
+        ros_pkg = get_ros_pkg(self.env)
+        cache = get_ros_ws_cache(self.env)
+        # Files added later are no dependency yet, a new listing reads the document again.
+        listings = get_ros_ws_listing(self.env).setdefault(self.env.docname, {})
+        listings[str(root)] = workspace_listing(root)
+        placeholders = []
+        for pkg_dir in find_packages(root):
+            try:
+                data, files, errors = scan_package(pkg_dir, cache)
+            except WorkspaceParseError as exc:
+                logger.warning("ros package skipped, %s", exc, location=self.get_location())
+                continue
+            for error in errors:
+                logger.warning("ros file skipped, %s", error, location=self.get_location())
+            for file in files:
+                self.env.note_dependency(str(file))
+            pkg = package_from_workspace(data, self.env.docname)
+            get_ros_changes(self.env)[0].add(pkg.name)
+            ros_pkg[pkg.name] = pkg
+            if "show" in self.options:
+                placeholders.append(package_placeholder(self, pkg.name))
+        return placeholders
+
+
+def package_from_workspace(data: dict, docname: str) -> RosPackage:
+    """Create a package from the description extracted from its workspace files."""
+    pkg = RosPackage(name=data["name"], description=data["description"], docname=docname)
+    for name, executable in data["executables"].items():
+        pkg.add_exec(
+            exec_name=name,
+            loc=executable["loc"],
+            short_descr=executable["doc"].partition("\n")[0],
+            long_descr=executable["doc"],
+        )
+        for param in executable["params"]:
+            pkg.executables[name].add_param(
+                name=param["name"], param_type=param["type"], default=param["default"]
+            )
+        for interface in executable["interfaces"]:
+            pkg.executables[name].add_interface(
+                interface["name"],
+                None,
+                interface["category"],
+                interface.get("in_type"),
+                None,
+                interface.get("out_type"),
+                None,
+                interface.get("status_type"),
+                None,
+            )
+    for name, launch in data["launch"].items():
+        pkg.add_launch(
+            exec_name=name,
+            loc=launch["loc"],
+            short_descr=launch["doc"].partition("\n")[0],
+            long_descr=launch["doc"],
+            exec_used=list(launch["exec_used"]),
+        )
+        for arg in launch["args"]:
+            pkg.launch[name].add_arg(
+                name=arg["name"], default=arg["default"], description=arg["description"]
+            )
+    return pkg
+
+
 class ShowPacakage(SphinxDirective):
     """Write description of a ros pacakge."""
 
     required_arguments = 1
+    option_spec = {"compact": flag, "split": flag, "lazy": flag}
 
     def run(self) -> list[nodes.Node]:
-        """Render the package description."""
-        pkg: RosPackage
-        pkg = ros_pkg[self.arguments[0]]
-        return [pkg.show()]
+        """Insert a placeholder rendered once every package is declared."""
+        return [package_placeholder(self, self.arguments[0])]
 
 
-class RefPackage(SphinxRole):
-    """A role to reference a ros package."""
+class ShowEntity(SphinxDirective):
+    """Write the description of an executable or launch file in its own section."""
+
+    required_arguments = 1
+    option_spec = {"package": unchanged, "compact": flag, "lazy": flag}
+    kind = ""
+    label = ""
+
+    def run(self) -> list[nodes.Node]:
+        """Insert the section of the entity, its content rendered once every package is declared."""
+        name = self.arguments[0]
+        node = ros_entity(
+            kind=self.kind,
+            name=name,
+            pkg_name=self.options.get("package"),
+            compact="compact" in self.options,
+            lazy="lazy" in self.options,
+        )
+        self.set_source_info(node)
+        get_ros_shown(self.env).setdefault(self.env.docname, set()).add((self.kind, name))
+        # The title is known before reading every document, so it can be the page title.
+        return [
+            nodes.section(
+                "", nodes.title("", f"{name} [{self.label}]"), node, ids=[f"{self.kind}_{name}"]
+            )
+        ]
+
+
+class ShowExec(ShowEntity):
+    """Write the description of a ros executable."""
+
+    kind = "exec"
+    label = "Executable"
+
+
+class ShowLaunch(ShowEntity):
+    """Write the description of a ros launch file."""
+
+    kind = "launch"
+    label = "Launch file"
+
+
+class ShowAcrossPackages(SphinxDirective):
+    """Insert a placeholder covering every package, or the packages of the :packages: option."""
+
+    option_spec = {"packages": unchanged}
+    kind = ""
+    placeholder = nodes.Element
+
+    def run(self) -> list[nodes.Node]:
+        """Insert the placeholder, rendered once every package is declared."""
+        packages = (
+            str_option_to_list(self.options["packages"]) if self.options.get("packages") else []
+        )
+        node = self.placeholder(packages=packages)
+        self.set_source_info(node)
+        get_ros_shown(self.env).setdefault(self.env.docname, set()).update(
+            (self.kind, name) for name in packages or [""]
+        )
+        return [node]
+
+
+def find_ros_entity(ros_pkg: dict[str, RosPackage], node: ros_entity) -> RosExec | RosLaunch | None:
+    """Return the executable or launch file of a placeholder, looked up in its package if given."""
+    if node["pkg_name"]:
+        packages = [ros_pkg[node["pkg_name"]]] if node["pkg_name"] in ros_pkg else []
+    else:
+        packages = sorted_packages(ros_pkg)
+    for pkg in packages:
+        entities = pkg.executables if node["kind"] == "exec" else pkg.launch
+        if node["name"] in entities:
+            return entities[node["name"]]
+    return None
+
+
+class ros_types(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Placeholder replaced by the field tables of interface types."""
+
+
+class ShowTypes(ShowAcrossPackages):
+    """Write the fields of the interface types defined in ``ros_interface_dirs``."""
+
+    kind = "types"
+    placeholder = ros_types
+
+
+def show_type(name: str, definition: dict) -> nodes.section:
+    """Render the fields of an interface type, a table per section of its definition."""
+    root = nodes.section(ids=[f"type_{name}"])
+    root.append(nodes.title("", name))
+    if definition["description"]:
+        root.append(nodes.paragraph("", definition["description"]))
+    sections = definition["sections"]
+    for title, fields in sections:
+        # Services and actions are referenced by section, as ``pkg/srv/Name_Request``.
+        if len(sections) > 1:
+            root.append(nodes.rubric("", title, ids=[f"type_{name}_{title}"]))
+        if not fields:
+            root.append(nodes.paragraph("", "No field."))
+            continue
+        root.append(
+            create_table(
+                ("Type", "Name", "Value", "Description"),
+                [
+                    create_table_row(
+                        type_reference(field["type"], field["ref"]),
+                        field["name"],
+                        f"{field['value']} (constant)"
+                        if field["constant"]
+                        else field["value"] or "",
+                        field["comment"],
+                    )
+                    for field in fields
+                ],
+            )
+        )
+    return root
+
+
+class ShowPackageTransform(SphinxPostTransform):
+    """Replace the placeholders by the description of the ros objects they show."""
+
+    # Run before references are resolved so the rendered content gets resolved too.
+    default_priority = 5
+
+    def run(self, **kwargs) -> None:
+        """Render every package, executable and launch file shown in the document."""
+        placeholders = list(self.document.findall(is_ros_placeholder))
+        if not placeholders:
+            return
+        ros_pkg = get_ros_pkg(self.env)
+        ros_exec = get_ros_exec(self.env)
+        profiling = self.config.ros_profile
+        for node in placeholders:
+            if isinstance(node, ros_types):
+                node.replace_self(self.show_types(node))
+                continue
+            compact = node["compact"] or self.config.ros_compact_tables
+            # Placeholders of doctrees pickled before the option have no lazy attribute.
+            lazy = node.get("lazy", False) or self.config.ros_lazy_details
+            if isinstance(node, ros_entity):
+                entity = find_ros_entity(ros_pkg, node)
+                if entity is None:
+                    logger.warning("unknown ros %s %r", node["kind"], node["name"], location=node)
+                    node.replace_self([])
+                    continue
+                with profiled(self.env, "ShowPackageTransform") if profiling else nullcontext():
+                    if node["kind"] == "exec":
+                        section = entity.show(compact, lazy)
+                    else:
+                        section = entity.show(ros_exec, compact, lazy)
+                # The section holding the placeholder already has the title and the anchor.
+                node.replace_self(section.children[1:])
+                continue
+            pkg = ros_pkg.get(node["pkg_name"])
+            if pkg is None:
+                logger.warning("unknown ros package %r", node["pkg_name"], location=node)
+                node.replace_self([])
+                continue
+            with profiled(self.env, "ShowPackageTransform") if profiling else nullcontext():
+                section = pkg.show(ros_exec, compact, node["split"], lazy)
+            if self.app.builder.format == "html":
+                # The nodes stay in the page for the search index, only their html is reused.
+                key = rendering_key(pkg, compact, node["split"], lazy)
+                section = ros_rendered("", section, key=key)
+            node.replace_self(section)
+
+    def show_types(self, node: ros_types) -> list[nodes.section]:
+        """Render the types of the packages of a placeholder, of every package if none."""
+        types = get_ros_types(self.env)
+        packages = {name.partition("/")[0] for name in types}
+        for name in node["packages"]:
+            if name not in packages:
+                logger.warning(
+                    "show_ros_types: no interface type in package %s", name, location=node
+                )
+        return [
+            show_type(name, definition)
+            for name, definition in sorted(types.items())
+            if not node["packages"] or name.partition("/")[0] in node["packages"]
+        ]
+
+
+def rendering_key(pkg: RosPackage, compact: bool, split: bool, lazy: bool) -> tuple:
+    """Return the key of the html markup of a package shown with some options.
+
+    A digest of the declarations of the package, the other packages not changing during a
+    build.
+    """
+    state = pickle.dumps(pkg.state(), pickle.HIGHEST_PROTOCOL)
+    return (hashlib.sha1(state, usedforsecurity=False).hexdigest(), compact, split, lazy)
+
+
+def is_ros_placeholder(node: nodes.Node) -> bool:
+    """Tell whether a node is replaced by the rendering of a ros object."""
+    return isinstance(node, (ros_package, ros_entity, ros_types))
+
+
+class RosXRefRole(XRefRole):
+    """A role referencing a ros object through the ros domain, whatever the role name."""
+
+    ros_reftype = ""
+
+    def __init__(self) -> None:
+        super().__init__(warn_dangling=True)
 
     def run(self) -> tuple[list[nodes.Node], list[nodes.system_message]]:
-        """Render a reference to ros package."""
-        node = nodes.inline("", "", nodes.reference("", f"{self.text}", refid=f"pkg_{self.text}"))
-        return [node], []
+        """Create a reference resolved by the ros domain."""
+        self.refdomain, self.reftype = "ros", self.ros_reftype
+        self.classes = ["xref", "ros", f"ros-{self.reftype}"]
+        return self.create_xref_node()
 
 
-class RefExec(SphinxRole):
+class RefPackage(RosXRefRole):
+    """A role to reference a ros package."""
+
+    ros_reftype = "pkg"
+
+
+class RefExec(RosXRefRole):
     """A role to reference a ros executable."""
 
-    def run(self) -> tuple[list[nodes.Node], list[nodes.system_message]]:
-        """Render a reference to ros executable."""
-        node = nodes.inline("", "", nodes.reference("", f"{self.text}", refid=f"exec_{self.text}"))
-        return [node], []
+    ros_reftype = "exec"
 
 
-class RefLaunch(SphinxRole):
+class RefLaunch(RosXRefRole):
     """A role to reference a ros launch file."""
 
-    def run(self) -> tuple[list[nodes.Node], list[nodes.system_message]]:
-        """Render a reference to ros launch."""
-        node = nodes.inline(
-            "", "", nodes.reference("", f"{self.text}", refid=f"launch_{self.text}")
+    ros_reftype = "launch"
+
+
+class RosDomain(Domain):
+    """Index of the ros objects, resolving references to them and exporting them to intersphinx.
+
+    Objects are anchored in the document showing them, the first one in name order if several
+    do, executables and launch files preferring their own page to the page of their package.
+    Parameters, interfaces and arguments are named ``owner:name``.
+    """
+
+    name = "ros"
+    label = "ROS"
+    object_types = {
+        "package": ObjType("package", "pkg"),
+        "executable": ObjType("executable", "exec"),
+        "launch": ObjType("launch file", "launch"),
+        "parameter": ObjType("parameter", "param"),
+        "interface": ObjType("interface", "interface"),
+        "argument": ObjType("launch argument", "arg"),
+        "type": ObjType("interface type", "type"),
+    }
+    roles = {
+        "pkg": XRefRole(warn_dangling=True),
+        "exec": XRefRole(warn_dangling=True),
+        "launch": XRefRole(warn_dangling=True),
+        "param": XRefRole(warn_dangling=True),
+        "interface": XRefRole(warn_dangling=True),
+        "arg": XRefRole(warn_dangling=True),
+        "type": XRefRole(warn_dangling=True),
+    }
+    dangling_warnings = {
+        "pkg": "undefined ros package: %(target)s",
+        "exec": "undefined ros executable: %(target)s",
+        "launch": "undefined ros launch file: %(target)s",
+        "param": "undefined ros parameter: %(target)s",
+        "interface": "undefined ros interface: %(target)s",
+        "arg": "undefined ros launch argument: %(target)s",
+        "type": "undefined ros interface type: %(target)s",
+    }
+    # (object type, name) -> (docname, anchor)
+    initial_data = {"objects": {}}
+    data_version = 1
+
+    @property
+    def objects(self) -> dict[tuple[str, str], tuple[str, str]]:
+        """Return the object table."""
+        return self.data["objects"]
+
+    def index_registry(self) -> None:
+        """Rebuild the object table from the registry and the documents showing packages."""
+        ros_pkg = get_ros_pkg(self.env)
+        ros_exec = get_ros_exec(self.env)
+        self.objects.clear()
+        shown = sorted(get_ros_shown(self.env).items())
+        # The own pages of executables and launch files come before the packages rendered whole.
+        for docname, items in shown:
+            for kind, name in sorted(items):
+                if kind == "exec" and name in ros_exec:
+                    self.index_exec(docname, ros_exec[name])
+                elif kind == "launch":
+                    for pkg in sorted_packages(ros_pkg):
+                        if name in pkg.launch:
+                            self.index_launch(docname, pkg.launch[name])
+        for docname, items in shown:
+            for kind, name in sorted(items):
+                if kind not in {"pkg", "toc"} or name not in ros_pkg:
+                    continue
+                if ("package", name) in self.objects:
+                    continue
+                self.objects["package", name] = (docname, f"pkg_{name}")
+                if kind == "toc":
+                    continue
+                for exe in ros_pkg[name].executables.values():
+                    self.index_exec(docname, exe)
+                for launch in ros_pkg[name].launch.values():
+                    self.index_launch(docname, launch)
+        # Types listed by package come before the listings of every type.
+        types = get_ros_types(self.env)
+        for every in (False, True):
+            for docname, items in shown:
+                for kind, name in sorted(items):
+                    if kind == "types" and (name == "") is every:
+                        self.index_types(docname, types, name)
+
+    def index_exec(self, docname: str, exe: RosExec) -> None:
+        """Anchor an executable and its entities in a document, unless already anchored."""
+        if ("executable", exe.name) in self.objects:
+            return
+        self.objects["executable", exe.name] = (docname, f"exec_{exe.name}")
+        for param in exe.params:
+            key = f"{exe.name}:{param.name}"
+            self.objects["parameter", key] = (docname, f"param_{exe.name}_{param.name}")
+        for interface in exe.interfaces:
+            key = f"{exe.name}:{interface.name}"
+            self.objects["interface", key] = (docname, f"interface_{exe.name}_{interface.name}")
+
+    def index_launch(self, docname: str, launch: RosLaunch) -> None:
+        """Anchor a launch file and its arguments in a document, unless already anchored."""
+        if ("launch", launch.name) in self.objects:
+            return
+        self.objects["launch", launch.name] = (docname, f"launch_{launch.name}")
+        for arg in launch.args:
+            key = f"{launch.name}:{arg.name}"
+            self.objects["argument", key] = (docname, f"arg_{launch.name}_{arg.name}")
+
+    def index_types(self, docname: str, types: dict[str, dict], package: str) -> None:
+        """Anchor the types of a package, or every type, in a document, unless already anchored."""
+        for name, definition in types.items():
+            if package and name.partition("/")[0] != package or ("type", name) in self.objects:
+                continue
+            self.objects["type", name] = (docname, f"type_{name}")
+            if len(definition["sections"]) > 1:
+                for title, _ in definition["sections"]:
+                    key = f"{name}_{title}"
+                    self.objects["type", key] = (docname, f"type_{key}")
+
+    def clear_doc(self, docname: str) -> None:
+        """Forget the objects anchored in a document."""
+        for key in [key for key, (obj_doc, _) in self.objects.items() if obj_doc == docname]:
+            del self.objects[key]
+
+    def merge_domaindata(self, docnames: Set[str], otherdata: dict) -> None:
+        """Nothing to merge, the table is rebuilt once every document is read."""
+
+    def resolve_xref(
+        self,
+        env: BuildEnvironment,
+        fromdocname: str,
+        builder: Builder,
+        typ: str,
+        target: str,
+        node: addnodes.pending_xref,
+        contnode: nodes.Element,
+    ) -> nodes.reference | None:
+        """Resolve a reference made with one of the ros roles."""
+        for objtype in self.objtypes_for_role(typ) or []:
+            if (objtype, target) in self.objects:
+                docname, anchor = self.objects[objtype, target]
+                return make_refnode(builder, fromdocname, docname, anchor, contnode, target)
+        return None
+
+    def resolve_any_xref(
+        self,
+        env: BuildEnvironment,
+        fromdocname: str,
+        builder: Builder,
+        target: str,
+        node: addnodes.pending_xref,
+        contnode: nodes.Element,
+    ) -> list[tuple[str, nodes.reference]]:
+        """Resolve a reference made with the any role."""
+        return [
+            (
+                f"ros:{self.role_for_objtype(objtype)}",
+                make_refnode(builder, fromdocname, docname, anchor, contnode, target),
+            )
+            for objtype in self.object_types
+            if (objtype, target) in self.objects
+            for docname, anchor in [self.objects[objtype, target]]
+        ]
+
+    def get_objects(self) -> Iterator[tuple[str, str, str, str, str, int]]:
+        """Yield the objects exported to the inventory."""
+        for (objtype, name), (docname, anchor) in sorted(self.objects.items()):
+            priority = 1 if objtype in {"package", "executable", "launch"} else 2
+            yield name, name, objtype, docname, anchor, priority
+
+
+def index_ros_objects(app: Sphinx, env: BuildEnvironment) -> None:
+    """Index the ros objects once every document is read."""
+    env.domains["ros"].index_registry()
+
+
+class ros_search(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Search box looking the ros objects up in the precomputed index."""
+
+
+def visit_ros_search_html(translator: SphinxTranslator, node: ros_search) -> None:
+    """Write the search box, filled by ros_search.js."""
+    translator.body.append(
+        '<div class="ros-search"><input type="search" placeholder="Search ros objects and types"'
+        ' aria-label="Search ros objects and types"><ul class="ros-search-results"></ul></div>'
+    )
+    raise nodes.SkipNode
+
+
+def visit_ros_rendered_html(translator: SphinxTranslator, node: ros_rendered) -> None:
+    """Write the markup of a package rendered the same way by a previous page, or render it."""
+    # The page only changes the headings, after the enclosing sections, and the resolved links.
+    links = tuple(reference.get("refuri", "") for reference in node.findall(nodes.reference))
+    key = (node["key"], translator.section_level, links)
+    rendered = get_ros_rendered(translator.builder)
+    if key in rendered:
+        translator.body.append(rendered[key])
+        raise nodes.SkipNode
+    node["rendering"] = (key, len(translator.body))
+
+
+def depart_ros_rendered_html(translator: SphinxTranslator, node: ros_rendered) -> None:
+    """Keep the markup of a package for the next pages showing it the same way."""
+    key, start = node["rendering"]
+    get_ros_rendered(translator.builder)[key] = "".join(translator.body[start:])
+
+
+def visit_ros_details_html(translator: SphinxTranslator, node: ros_details) -> None:
+    """Write the details in their own file, fetched by ros_details.js when opened.
+
+    Files are named after their content, so the details of the previous builds are kept as is
+    until no page links to them.
+    Ebooks are read without a server, so they keep the details in the page.
+    """
+    builder = translator.builder
+    if builder.name.startswith("epub"):
+        return
+    # Rendered where they stand, the details get the headings they would have in the page.
+    rendering = builder.create_translator(translator.document, builder)
+    rendering.section_level = translator.section_level
+    for child in node.children:
+        child.walkabout(rendering)
+    content = "".join(rendering.body).encode()
+    name = f"{hashlib.sha1(content, usedforsecurity=False).hexdigest()[:16]}.html"
+    directory = Path(builder.outdir, DETAILS_DIR)
+    if not (directory / name).is_file():
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / name).write_bytes(content)
+    prefixes = html.escape(" ".join(node["prefixes"]))
+    translator.body.append(
+        f'<details class="ros-details" data-src="{DETAILS_DIR}/{name}" data-prefixes="{prefixes}">'
+        f"<summary>{html.escape(node['summary'])}</summary>"
+        '<div class="ros-details-content"></div></details>'
+    )
+    raise nodes.SkipNode
+
+
+def keep_details_inline(translator: SphinxTranslator, node: ros_details) -> None:
+    """Render the details in the page in the formats other than html."""
+
+
+def skip_html_only(translator: SphinxTranslator, node: nodes.Element) -> None:
+    """Leave the search box and the graph out of the formats other than html."""
+    raise nodes.SkipNode
+
+
+class RosSearch(SphinxDirective):
+    """Insert a search box over the parameters, interfaces, arguments and types."""
+
+    def run(self) -> list[nodes.Node]:
+        """Insert the search box."""
+        return [ros_search()]
+
+
+# Kinds of the search index entries, numbered by their position.
+SEARCH_KINDS = ("package", "executable", "launch", "parameter", "interface", "argument", "type")
+# Anchor prefixes of the ros domain, entities of an executable or launch file being anchored
+# ``{prefix}_{owner}_{name}`` and the others ``{prefix}_{name}``.
+SEARCH_ANCHORS = {
+    "package": "pkg",
+    "executable": "exec",
+    "launch": "launch",
+    "parameter": "param",
+    "interface": "interface",
+    "argument": "arg",
+}
+
+
+def ros_search_index(env: BuildEnvironment, builder: Builder) -> dict:
+    """Return the lookup table of the shown ros objects and of their interface types.
+
+    Entries are sorted by name. Packages, executables and launch files are
+    ``[name, kind, page, detail]``, their entities ``[name, kind, owner, detail]`` and types
+    ``[name, kind, interface]``, where kind, page, owner and interface are indices. Anchors
+    are left to the client, so the table stays compact with tens of thousands of entries.
+    """
+    objects = env.domains["ros"].objects
+    pages = {}
+    entries = []
+
+    def add(kind: str, key: str, name: str, target: list | None = None, detail=None) -> list:
+        if (kind, key) not in objects:
+            return None
+        if target is None:
+            page_uri = builder.get_target_uri(objects[kind, key][0])
+            target = pages.setdefault(page_uri, len(pages))
+        entry = [name, SEARCH_KINDS.index(kind), target]
+        if detail is not None:
+            entry.append(detail)
+        entries.append(entry)
+        return entry
+
+    for pkg in sorted_packages(get_ros_pkg(env)):
+        add("package", pkg.name, pkg.name, detail="")
+        for exe in pkg.executables.values():
+            owner = add("executable", exe.name, exe.name, detail=pkg.name)
+            for param in exe.params:
+                key = f"{exe.name}:{param.name}"
+                add("parameter", key, param.name, owner, param.param_type or "")
+            for interface in exe.interfaces:
+                key = f"{exe.name}:{interface.name}"
+                found = add("interface", key, interface.name, owner, interface.category)
+                types = {interface.in_type, interface.out_type, interface.status_type}
+                for interface_type in sorted(types - {None, ""}) if found else ():
+                    entries.append([interface_type, SEARCH_KINDS.index("type"), found])
+        for launch in pkg.launch.values():
+            owner = add("launch", launch.name, launch.name, detail=pkg.name)
+            for arg in launch.args:
+                key = f"{launch.name}:{arg.name}"
+                add("argument", key, arg.name, owner, arg.param_type or "")
+    entries.sort(key=lambda entry: (entry[0].lower(), entry[1]))
+    positions = {id(entry): position for position, entry in enumerate(entries)}
+    for entry in entries:
+        if isinstance(entry[2], list):
+            entry[2] = positions[id(entry[2])]
+    return {
+        "kinds": SEARCH_KINDS,
+        "anchors": SEARCH_ANCHORS,
+        "pages": list(pages),
+        "entries": entries,
+    }
+
+
+def write_ros_search_index(app: Sphinx, exception: Exception | None) -> None:
+    """Write the lookup table and the scripts of the search boxes and details with the html."""
+    if exception is not None or app.builder.format != "html" or not get_ros_pkg(app.env):
+        return
+    static_dir = app.outdir / "_static"
+    static_dir.mkdir(parents=True, exist_ok=True)
+    with (static_dir / "ros_index.json").open("w", encoding="utf-8") as output:
+        json.dump(ros_search_index(app.env, app.builder), output, separators=(",", ":"))
+    copy_asset_file(Path(__file__).parent / "static" / "ros_search.js", static_dir)
+    copy_asset_file(Path(__file__).parent / "static" / "ros_details.js", static_dir)
+
+
+def add_ros_search_script(
+    app: Sphinx, pagename: str, templatename: str, context: dict, doctree: document | None
+) -> None:
+    """Load the search script in the pages holding a search box, the details one with details."""
+    if doctree is not None and next(doctree.findall(ros_search), None) is not None:
+        app.add_js_file("ros_search.js")
+    if doctree is not None and next(doctree.findall(ros_details), None) is not None:
+        app.add_js_file("ros_details.js")
+
+
+class ros_graph(nodes.General, nodes.Element):  # noqa: N801, docutils node naming
+    """Placeholder drawn as the connection graph of the executables."""
+
+
+class ShowGraph(ShowAcrossPackages):
+    """Draw who publishes, subscribes, serves and calls every topic, service and action."""
+
+    kind = "graph"
+    placeholder = ros_graph
+
+
+def write_ros_graph(builder: Builder, graph: dict) -> str:
+    """Write the drawing and the adjacency of a graph in the images, return their name.
+
+    Files are named after their content, so the graphs of the previous builds are kept as is
+    until no page links to them.
+    """
+    objects = builder.env.domains["ros"].objects
+    # The drawing links to the executables from the images directory.
+    root = "../" * (builder.imagedir.count("/") + 1)
+    links = {}
+    for exe in graph["executables"]:
+        if ("executable", exe["name"]) in objects:
+            docname, anchor = objects["executable", exe["name"]]
+            links[exe["name"]] = f"{root}{builder.get_target_uri(docname)}#{anchor}"
+    adjacency = json.dumps(graph, separators=(",", ":"))
+    content = (adjacency + json.dumps(links, sort_keys=True)).encode()
+    name = f"ros_graph-{hashlib.sha1(content, usedforsecurity=False).hexdigest()[:16]}"
+    directory = Path(builder.outdir, builder.imagedir)
+    if not (directory / f"{name}.svg").is_file():
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{name}.json").write_text(adjacency, encoding="utf-8")
+        (directory / f"{name}.svg").write_text(graph_svg(graph, links), encoding="utf-8")
+    return name
+
+
+def visit_ros_graph_html(translator: SphinxTranslator, node: ros_graph) -> None:
+    """Show the drawing of the graph, restricted to some packages if given."""
+    graph = get_ros_graph(translator.builder.env)
+    if node["packages"]:
+        ros_pkg = get_ros_pkg(translator.builder.env)
+        for name in node["packages"]:
+            if name not in ros_pkg:
+                logger.warning("show_ros_graph: unknown ros package %s", name, location=node)
+        graph = package_subgraph(graph, node["packages"])
+    if graph["channels"]:
+        name = write_ros_graph(translator.builder, graph)
+        path = f"{translator.builder.imgpath}/{name}"
+        translator.body.append(
+            f'<div class="ros-graph"><object data="{path}.svg" type="image/svg+xml"></object>'
+            f'<p><a href="{path}.json">Connections as json</a></p></div>'
+        )
+    raise nodes.SkipNode
+
+
+def note_ros_written(app: Sphinx, doctree: nodes.document, docname: str) -> None:
+    """Remember the written documents, resolved in the main process even by parallel writes."""
+    get_ros_written(app.builder).add(docname)
+
+
+def remove_stale_ros_outputs(app: Sphinx, exception: Exception | None) -> None:
+    """Remove the files named after their content that no page links to anymore.
+
+    The pages written by the build are read for the files they link to, the links of the other
+    pages are kept in a manifest of the output directory. Without manifest, every page is read.
+    """
+    if exception is not None or app.builder.format != "html":
+        return
+    builder = app.builder
+    manifest = Path(app.outdir, OUTPUTS_MANIFEST)
+    written = get_ros_written(builder)
+    links = {}
+    if manifest.is_file():
+        links = json.loads(manifest.read_text(encoding="utf-8"))
+    else:
+        written = app.env.found_docs
+    pattern = re.compile(
+        rf"{re.escape(builder.imagedir)}/ros_graph-[0-9a-f]{{16}}\.(?:svg|json)"
+        rf"|{DETAILS_DIR}/[0-9a-f]{{16}}\.html"
+    )
+    for docname in written:
+        path = Path(builder.get_outfilename(docname))
+        if path.is_file():
+            links[docname] = sorted(set(pattern.findall(path.read_text(encoding="utf-8"))))
+    links = {
+        docname: files
+        for docname, files in links.items()
+        if files and docname in app.env.found_docs
+    }
+    with FileAvoidWrite(manifest) as output:
+        json.dump(links, output, indent=1, sort_keys=True)
+    linked = {file for files in links.values() for file in files}
+    outputs = [
+        *Path(app.outdir, builder.imagedir).glob("ros_graph-*"),
+        *Path(app.outdir, DETAILS_DIR).glob("*.html"),
+    ]
+    for path in outputs:
+        if path.relative_to(app.outdir).as_posix() not in linked:
+            path.unlink()
+
+
+def iter_ros_records(ros_pkg: dict[str, RosPackage]) -> Iterator[dict]:
+    """Yield one flat record per entity of the registry, each package before its content."""
+    for pkg in sorted_packages(ros_pkg):
+        yield {
+            "kind": "package",
+            "name": pkg.name,
+            "description": pkg.description,
+            "docname": pkg.docname,
+        }
+        for executable in pkg.executables.values():
+            yield {
+                "kind": "executable",
+                "package": pkg.name,
+                "name": executable.name,
+                "loc": executable.loc,
+                "short_descr": executable.short_descr,
+                "long_descr": executable.long_descr,
+            }
+            for param in executable.params:
+                yield {
+                    "kind": "parameter",
+                    "package": pkg.name,
+                    "executable": executable.name,
+                    "name": param.name,
+                    "type": param.param_type,
+                    "default": param.default,
+                    "description": param.description,
+                }
+            for interface in executable.interfaces:
+                yield {
+                    "kind": "interface",
+                    "package": pkg.name,
+                    "executable": executable.name,
+                    "name": interface.name,
+                    "category": interface.category,
+                    "description": interface.descr,
+                    "in_type": interface.in_type,
+                    "in_description": interface.in_descr,
+                    "out_type": interface.out_type,
+                    "out_description": interface.out_descr,
+                    "status_type": interface.status_type,
+                    "status_description": interface.status_descr,
+                }
+        for launch in pkg.launch.values():
+            yield {
+                "kind": "launch",
+                "package": pkg.name,
+                "name": launch.name,
+                "loc": launch.loc,
+                "short_descr": launch.short_descr,
+                "long_descr": launch.long_descr,
+                "exec_used": launch.exec_used,
+            }
+            for arg in launch.args:
+                yield {
+                    "kind": "argument",
+                    "package": pkg.name,
+                    "launch": launch.name,
+                    "name": arg.name,
+                    "type": arg.param_type,
+                    "default": arg.default,
+                    "description": arg.description,
+                }
+
+
+class RosJsonBuilder(Builder):
+    """Export the ros registry as NDJSON, one record per entity, without rendering documents."""
+
+    name = "rosjson"
+    format = "json"
+    epilog = "The ros registry is in %(outdir)s/ros_registry.ndjson."
+    allow_parallel = True
+    # Nothing is rendered, so neither the placeholders nor any image are resolved.
+    supported_image_types = ["*"]
+
+    def init(self) -> None:
+        """Nothing to initialize."""
+
+    def get_outdated_docs(self) -> set[str]:
+        """Every document is part of the export."""
+        return self.env.found_docs
+
+    def get_target_uri(self, docname: str, typ: str | None = None) -> str:
+        """No document is written."""
+        return ""
+
+    def prepare_writing(self, docnames: Set[str]) -> None:
+        """Nothing to prepare."""
+
+    def write(
+        self,
+        build_docnames: Iterable[str] | None,
+        updated_docnames: Iterable[str],
+        method: str = "update",
+    ) -> None:
+        """Skip resolving and writing the documents.
+
+        Overridden whole, the ``write_documents`` hook of recent Sphinx versions is not there
+        on Sphinx 7.
+        """
+        self.events.emit("write-started", self)
+
+    def write_doc(self, docname: str, doctree: document) -> None:
+        """No document is written."""
+
+    def finish(self) -> None:
+        """Stream the registry to the output file."""
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        with (self.outdir / "ros_registry.ndjson").open("w", encoding="utf-8") as output:
+            for record in iter_ros_records(get_ros_pkg(self.env)):
+                output.write(json.dumps(record, ensure_ascii=False))
+                output.write("\n")
+
+
+# Registry written with the html output, merged with those of other projects by ros_aggregate.py.
+FRAGMENT_FILE = "ros_registry.ndjson.gz"
+# Bumped when the records of the fragments change.
+FRAGMENT_VERSION = 1
+
+
+def iter_ros_fragment(app: Sphinx) -> Iterator[dict]:
+    """Yield the header of the fragment, then the records of the registry with their url.
+
+    Urls are relative to the output directory. Interfaces also give the types of their
+    channel, joined with the channels of the other projects.
+    """
+    objects = app.env.domains["ros"].objects
+    ros_pkg = get_ros_pkg(app.env)
+    interfaces = {
+        (exe.name, interface.name): interface
+        for pkg in ros_pkg.values()
+        for exe in pkg.executables.values()
+        for interface in exe.interfaces
+    }
+    yield {
+        "kind": "fragment",
+        "version": FRAGMENT_VERSION,
+        "project": app.config.project,
+        "base_url": app.config.ros_fragment_base_url or app.config.html_baseurl,
+    }
+    for record in iter_ros_records(ros_pkg):
+        owner = record.get("executable", record.get("launch"))
+        key = record["name"] if owner is None else f"{owner}:{record['name']}"
+        if (record["kind"], key) in objects:
+            docname, anchor = objects[record["kind"], key]
+            record["url"] = f"{app.builder.get_target_uri(docname)}#{anchor}"
+        if record["kind"] == "interface":
+            record["channel_type"] = channel_type(interfaces[owner, record["name"]])
+        yield record
+
+
+def write_ros_fragment(app: Sphinx, exception: Exception | None) -> None:
+    """Write the registry fragment with the html output."""
+    if (
+        exception is not None
+        or app.builder.format != "html"
+        or not app.config.ros_registry_fragment
+        or not get_ros_pkg(app.env)
+    ):
+        return
+    lines = (
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for record in iter_ros_fragment(app)
+    )
+    # No timestamp in the archive, an unchanged registry leaves the file untouched.
+    content = gzip.compress("".join(lines).encode(), mtime=0)
+    path = app.outdir / FRAGMENT_FILE
+    if not path.is_file() or path.read_bytes() != content:
+        path.write_bytes(content)
+
+
+# Directive showing each kind of shown ros object.
+SHOW_DIRECTIVES = {
+    "pkg": "show_ros_pkg",
+    "toc": "show_ros_pkg",
+    "exec": "show_ros_exec",
+    "launch": "show_ros_launch",
+    "graph": "show_ros_graph",
+    "types": "show_ros_types",
+}
+# Lines using a ros directive, to only read these documents when linting.
+ROS_DIRECTIVE_LINE = r"^\s*\.\.\s+(?:{names})::"
+
+
+def directive_line(path: Path, directive: str, argument: str) -> int | None:
+    """Return the line of a source file where a directive is used with an argument."""
+    pattern = re.compile(
+        rf"{ROS_DIRECTIVE_LINE.format(names=re.escape(directive))}\s*{re.escape(argument)}\s*$"
+    )
+    for lineno, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        if pattern.match(line):
+            return lineno
+    return None
+
+
+class RosLintBuilder(RosJsonBuilder):
+    """Check the ros declarations, reading only the documents using ros directives."""
+
+    name = "roslint"
+    format = ""
+    epilog = "The ros declarations are checked."
+
+    def init(self) -> None:
+        """Hide the warnings coming from the documents left unread."""
+        self.config.suppress_warnings = [*self.config.suppress_warnings, "toc.not_included"]
+
+    def finish(self) -> None:
+        """Check the references between declarations once every document is read."""
+        ros_pkg = get_ros_pkg(self.env)
+        ros_exec = get_ros_exec(self.env)
+        for pkg in sorted_packages(ros_pkg):
+            path = Path(self.env.doc2path(pkg.docname))
+            for launch in pkg.launch.values():
+                # Launch files scanned from a workspace often start executables of other ones.
+                if launch.loc is not None:
+                    continue
+                for exec_name in launch.exec_used:
+                    if exec_name not in ros_exec:
+                        logger.warning(
+                            "begin_ros_launch: unknown executable %s used by %s",
+                            exec_name,
+                            launch.name,
+                            location=(
+                                pkg.docname,
+                                directive_line(path, "begin_ros_launch", launch.name),
+                            ),
+                        )
+        ros_launch = {name for pkg in ros_pkg.values() for name in pkg.launch}
+        known = {
+            "pkg": ros_pkg,
+            "toc": ros_pkg,
+            "exec": ros_exec,
+            "launch": ros_launch,
+            "graph": {"", *ros_pkg},
+            "types": {"", *(name.partition("/")[0] for name in get_ros_types(self.env))},
+        }
+        for docname, items in sorted(get_ros_shown(self.env).items()):
+            for kind, name in sorted(items):
+                if name in known[kind]:
+                    continue
+                directive = SHOW_DIRECTIVES[kind]
+                logger.warning(
+                    "%s: unknown ros %s %s",
+                    directive,
+                    "package" if kind in {"pkg", "toc", "graph", "types"} else kind,
+                    name,
+                    location=(
+                        docname,
+                        directive_line(Path(self.env.doc2path(docname)), directive, name),
+                    ),
+                )
+        logger.info("ros lint: %d packages, %d executables checked", len(ros_pkg), len(ros_exec))
+
+
+def read_ros_documents_only(app: Sphinx, env: BuildEnvironment, docnames: list[str]) -> None:
+    """Only read the root document and the documents using ros directives when linting."""
+    if app.builder.name != RosLintBuilder.name:
+        return
+    pattern = re.compile(
+        ROS_DIRECTIVE_LINE.format(names="|".join(map(re.escape, ROS_DIRECTIVES))), re.MULTILINE
+    )
+    docnames[:] = [
+        docname
+        for docname in docnames
+        if docname == app.config.root_doc
+        or pattern.search(Path(env.doc2path(docname)).read_text(encoding="utf-8"))
+    ]
+
+
+def check_ros_context(app: Sphinx, doctree: document) -> None:
+    """Report the package or executable left open at the end of a document."""
+    for key, directive in ((CTX_EXEC, "end_ros_exec"), (CTX_PKG, "end_ros_pkg")):
+        if app.env.temp_data.get(key):
+            logger.warning(
+                "%s is not ended by %s", app.env.temp_data[key], directive, location=app.env.docname
+            )
+
+
+# A directive with its argument, followed by its options.
+DIRECTIVE_BLOCK = re.compile(
+    r"^(?P<indent>[ \t]*)\.\.\s+(?P<directive>\w+)::[ \t]*(?P<argument>\S*)[ \t]*\n"
+    r"(?P<options>(?:(?P=indent)[ \t]+:\w+:.*\n)*)",
+    re.MULTILINE,
+)
+DIRECTIVE_OPTION = re.compile(r":(\w+):")
+# Options of a package shown split given to the pages of its executables and launch files.
+RENDER_OPTIONS = {"compact", "lazy"}
+# Sources written by generate_ros_pages in ros_pages_dir, the only ones it removes.
+PAGES_MANIFEST = ".ros_pages.json"
+
+
+def ros_pages_dir(app: Sphinx) -> Path | None:
+    """Return the directory of the generated pages, None if it is not inside the sources.
+
+    Generating pages removes those of the previous build, so the directory can never be the
+    source directory itself or outside of it.
+    """
+    srcdir = app.srcdir.resolve()
+    pages_dir = (srcdir / app.config.ros_pages_dir).resolve()
+    if pages_dir == srcdir or not pages_dir.is_relative_to(srcdir):
+        logger.warning(
+            "ros_pages_dir %r is not a sub-directory of the source directory, "
+            "no ros page generated",
+            app.config.ros_pages_dir,
         )
-        return [node], []
+        return None
+    return pages_dir
+
+
+def scan_ros_split(
+    app: Sphinx, pages_dir: Path
+) -> dict[str, tuple[list[str], list[tuple[str, str]]]]:
+    """Return the packages shown split, with their rendering options and their entities.
+
+    Sources are scanned without being read, so the pages exist before the reading starts.
+    """
+    env = app.env
+    srcdir = app.srcdir.resolve()
+    excluded = [*app.config.exclude_patterns, *app.config.templates_path]
+    declared = {}
+    split = {}
+    for filename in sorted(get_matching_files(srcdir, app.config.include_patterns, excluded)):
+        docname = app.project.path2doc(filename)
+        path = srcdir / filename
+        if docname is None or path.is_relative_to(pages_dir):
+            continue
+        source = path.read_text(encoding="utf-8")
+        if "_ros_" not in source:
+            continue
+        entities = None
+        for match in DIRECTIVE_BLOCK.finditer(source):
+            directive, argument = match["directive"], match["argument"]
+            options = set(DIRECTIVE_OPTION.findall(match["options"]))
+            shown_split = "split" in options or app.config.ros_split_pages
+            if directive == "begin_ros_pkg":
+                entities = declared.setdefault(argument, [])
+            elif directive == "end_ros_pkg":
+                entities = None
+            elif directive in {"begin_ros_exec", "begin_ros_launch"} and entities is not None:
+                entities.append((directive.rpartition("_")[2], argument))
+            elif directive == "show_ros_pkg" and shown_split:
+                split[argument] = sorted(RENDER_OPTIONS & options)
+            elif directive == "declare_ros_workspace" and "show" in options and shown_split:
+                root = Path(env.relfn2path(argument, docname)[1])
+                for pkg_dir in find_packages(root) if root.is_dir() else ():
+                    try:
+                        data = scan_package(pkg_dir, get_ros_ws_cache(env))[0]
+                    except WorkspaceParseError:
+                        continue
+                    declared[data["name"]] = [("exec", name) for name in data["executables"]]
+                    declared[data["name"]] += [("launch", name) for name in data["launch"]]
+                    split[data["name"]] = sorted(RENDER_OPTIONS & options)
+    return {name: (flags, declared.get(name, [])) for name, flags in split.items()}
+
+
+def generate_ros_pages(app: Sphinx) -> None:
+    """Write a source per executable and launch file of the packages shown split.
+
+    Like autosummary, each source only holds the directive showing its object. Unchanged
+    sources are left untouched and the sources of objects no longer shown are removed, only
+    ever removing the sources listed in the manifest of the previous generation.
+    """
+    pages_dir = ros_pages_dir(app)
+    if pages_dir is None:
+        return
+    manifest = pages_dir / PAGES_MANIFEST
+    split = scan_ros_split(app, pages_dir)
+    if not split and not manifest.is_file():
+        return
+    pages = {}
+    for pkg_name, (flags, entities) in split.items():
+        for kind, name in entities:
+            path = (pages_dir / pkg_name / kind / f"{name}.rst").resolve()
+            if not path.is_relative_to(pages_dir):
+                logger.warning("ros pages: no page for %s %s of %s", kind, name, pkg_name)
+                continue
+            lines = [":orphan:", "", f".. show_ros_{kind}:: {name}", f"   :package: {pkg_name}"]
+            lines += [f"   :{option}:" for option in flags]
+            pages[path.relative_to(pages_dir).as_posix()] = "\n".join(lines) + "\n"
+    previous = []
+    if manifest.is_file():
+        previous = json.loads(manifest.read_text(encoding="utf-8"))
+    for name in previous:
+        path = (pages_dir / name).resolve()
+        if name not in pages and path.is_relative_to(pages_dir):
+            path.unlink(missing_ok=True)
+    for name, source in pages.items():
+        (pages_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        with FileAvoidWrite(pages_dir / name) as output:
+            output.write(source)
+    if pages:
+        with FileAvoidWrite(manifest) as output:
+            json.dump(sorted(pages), output, indent=1)
+    else:
+        manifest.unlink()
+    if pages:
+        logger.info("ros pages: %d executable and launch file pages in %s", len(pages), pages_dir)
+
+
+def purge_ros_pkg(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    """Forget the packages declared and shown in a document about to be re-read."""
+    ros_pkg = get_ros_pkg(env)
+    changed_pkg, previous_pkg = get_ros_changes(env)
+    for name in [name for name, pkg in ros_pkg.items() if pkg.docname == docname]:
+        changed_pkg.add(name)
+        # Kept until the update, to only write again what the new declaration changes.
+        previous_pkg.setdefault(name, ros_pkg.pop(name))
+    get_ros_shown(env).pop(docname, None)
+    get_ros_ws_listing(env).pop(docname, None)
+
+
+def merge_ros_pkg(
+    app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment
+) -> None:
+    """Merge the packages read by a parallel worker into the main environment."""
+    ros_pkg = get_ros_pkg(env)
+    changed_pkg = get_ros_changes(env)[0]
+    for name, pkg in get_ros_pkg(other).items():
+        if pkg.docname not in docnames:
+            continue
+        changed_pkg.add(name)
+        if name in ros_pkg:
+            logger.warning(
+                "begin_ros_pkg: package %s already declared in %s",
+                name,
+                ros_pkg[name].docname,
+                location=(
+                    pkg.docname,
+                    directive_line(Path(env.doc2path(pkg.docname)), "begin_ros_pkg", name),
+                ),
+            )
+        # Same rule as a serial read: the last document in read order wins.
+        if name in ros_pkg and ros_pkg[name].docname > pkg.docname:
+            continue
+        ros_pkg[name] = pkg
+    shown = get_ros_shown(env)
+    for docname, items in get_ros_shown(other).items():
+        if docname in docnames:
+            shown[docname] = items
+    listings = get_ros_ws_listing(env)
+    for docname, roots in get_ros_ws_listing(other).items():
+        if docname in docnames:
+            listings[docname] = roots
+    # Every entry is valid whichever worker parsed the file.
+    get_ros_ws_cache(env).update(get_ros_ws_cache(other))
+    if app.config.ros_profile:
+        merge_profile(env, docnames, other)
+
+
+def same_content(old: Compact | None, new: Compact | None) -> bool:
+    """Tell whether two states of a registry object render the same."""
+    if old is None or new is None:
+        return old is new
+    # Pickled bytes also depend on the identity of the strings, not only on their value.
+    return old.state() == new.state()
+
+
+def changed_ros_items(old: RosPackage | None, new: RosPackage | None) -> set[tuple[str, str]]:
+    """Return the (kind, name) of the shown objects rendered differently in a new package state."""
+    if old is None and new is None:
+        return set()
+    name = (old or new).name
+    changed = set()
+    if not same_content(old, new):
+        changed.add(("pkg", name))
+    if (old and old.toc_summary()) != (new and new.toc_summary()):
+        changed.add(("toc", name))
+    for kind, attribute in (("exec", "executables"), ("launch", "launch")):
+        old_items = getattr(old, attribute, {})
+        new_items = getattr(new, attribute, {})
+        changed.update(
+            (kind, item)
+            for item in old_items.keys() | new_items.keys()
+            if not same_content(old_items.get(item), new_items.get(item))
+        )
+    return changed
+
+
+def outdated_ros_workspaces(
+    app: Sphinx, env: BuildEnvironment, added: Set[str], changed: Set[str], removed: Set[str]
+) -> list[str]:
+    """Return the documents declaring a workspace where files were added or removed."""
+    outdated = []
+    for docname, roots in get_ros_ws_listing(env).items():
+        if docname in changed or docname in removed:
+            continue
+        for root, listing in roots.items():
+            if not Path(root).is_dir() or workspace_listing(Path(root)) != listing:
+                outdated.append(docname)
+                break
+    return outdated
+
+
+def outdated_ros_pages(app: Sphinx, env: BuildEnvironment) -> list[str]:
+    """Return the documents showing a ros object changed by the documents just read.
+
+    Packages are rendered when writing, so these pages only need to be written again. The
+    declarations read again are compared with their former state, so editing an executable
+    only writes again the pages showing it.
+    """
+    ros_pkg = get_ros_pkg(env)
+    changed_pkg, previous_pkg = get_ros_changes(env)
+    changed = set()
+    for name in changed_pkg:
+        changed |= changed_ros_items(previous_pkg.get(name), ros_pkg.get(name))
+    # Launch files show the short description of the executables they use.
+    changed_exec = {name for kind, name in changed if kind == "exec"}
+    for pkg in ros_pkg.values():
+        for launch in pkg.launch.values():
+            if not changed_exec.isdisjoint(launch.exec_used):
+                changed.update((("pkg", pkg.name), ("launch", launch.name)))
+    shown = get_ros_shown(env)
+    # The graph spans every package, it is computed again once any of them changed.
+    if changed_pkg:
+        previous_graph = getattr(env, "ros_graph", None)
+        env.ros_graph = None
+        graph_items = {item for items in shown.values() for item in items if item[0] == "graph"}
+        if graph_items and get_ros_graph(env) != previous_graph:
+            changed |= graph_items
+    outdated = sorted(docname for docname, items in shown.items() if items & changed)
+    changed_pkg.clear()
+    previous_pkg.clear()
+    return outdated
+
+
+def update_ros_types(app: Sphinx, env: BuildEnvironment) -> list[str]:
+    """Parse the interface definitions changed since the last build, return the pages to write.
+
+    Pages showing types are written again when a definition changed, and every page showing
+    ros objects when a type was added or removed, since their type links change too.
+    """
+    cache = get_ros_types_cache(env)
+    types = {}
+    files = set()
+    for directory in app.config.ros_interface_dirs:
+        root = (app.confdir / directory).resolve()
+        if not root.is_dir():
+            logger.warning("ros interface directory %s not found", root)
+            continue
+        found, read, errors = scan_interfaces(root, cache)
+        for error in errors:
+            logger.warning("ros interface skipped, %s", error)
+        # The first directories take precedence, as in a search path.
+        for name, definition in found.items():
+            types.setdefault(name, definition)
+        files.update(map(str, read))
+    for path in cache.keys() - files:
+        del cache[path]
+    previous = get_ros_types(env)
+    env.ros_types = types
+    if types == previous:
+        return []
+    shown = get_ros_shown(env)
+    if types.keys() != previous.keys():
+        return sorted(shown)
+    return sorted(
+        docname for docname, items in shown.items() if any(kind == "types" for kind, _ in items)
+    )
+
+
+def report_ros_registry(app: Sphinx, env: BuildEnvironment) -> None:
+    """Log the size of the ros registry once the sources are read."""
+    ros_pkg = get_ros_pkg(env)
+    if not ros_pkg:
+        return
+    executables = [exe for pkg in ros_pkg.values() for exe in pkg.executables.values()]
+    launches = [launch for pkg in ros_pkg.values() for launch in pkg.launch.values()]
+    logger.info(
+        "ros registry: %d packages, %d executables, %d parameters, %d interfaces, "
+        "%d launch files, %d arguments, %d bytes pickled",
+        len(ros_pkg),
+        len(executables),
+        sum(len(exe.params) for exe in executables),
+        sum(len(exe.interfaces) for exe in executables),
+        len(launches),
+        sum(len(launch.args) for launch in launches),
+        len(pickle.dumps(ros_pkg, pickle.HIGHEST_PROTOCOL)),
+    )
+
+
+def enable_ros_profile(app: Sphinx, config: Config) -> None:
+    """Time the ros directives and show methods if ``ros_profile`` is set."""
+    if not config.ros_profile:
+        return
+    for name, directive in ROS_DIRECTIVES.items():
+        app.add_directive(name, profile_directive(name, directive), override=True)
+    for cls in (RosPackage, RosExec, RosLaunch, Param, Interface):
+        profile_method(cls, "show")
+
+
+def reset_ros_profile(app: Sphinx) -> None:
+    """Forget the timings of the previous build."""
+    if app.config.ros_profile:
+        app.env.ros_profile = {}
+
+
+def write_ros_profile(app: Sphinx, exception: Exception | None) -> None:
+    """Write the timings of the build in the output directory."""
+    if exception is not None or not app.config.ros_profile:
+        return
+    path = Path(app.outdir, app.config.ros_profile)
+    write_profile(app.env, path)
+    logger.info("ros profile written to %s", path)
+
+
+ROS_DIRECTIVES = {
+    "declare_ros_parameter": DeclareParam,
+    "declare_ros_parameters_from": DeclareParamsFrom,
+    "declare_ros_arg": DeclareArg,
+    "declare_ros_interface": DeclareInterface,
+    "begin_ros_pkg": DeclarePackage,
+    "begin_ros_exec": DeclareExec,
+    "begin_ros_launch": DeclareLaunch,
+    "end_ros_pkg": EndPackage,
+    "end_ros_exec": EndExec,
+    "end_ros_launch": EndExec,
+    "show_ros_pkg": ShowPacakage,
+    "show_ros_exec": ShowExec,
+    "show_ros_launch": ShowLaunch,
+    "ros_search": RosSearch,
+    "show_ros_graph": ShowGraph,
+    "show_ros_types": ShowTypes,
+    "declare_ros_workspace": DeclareWorkspace,
+}
 
 
 def setup(app: Sphinx) -> dict:
     """Declare new roles and directives usable in doc rst files."""
-    app.add_directive("declare_ros_parameter", DeclareParam)
-    app.add_directive("declare_ros_arg", DeclareArg)
-    app.add_directive("declare_ros_interface", DeclareInterface)
-    app.add_directive("begin_ros_pkg", DeclarePackage)
-    app.add_directive("begin_ros_exec", DeclareExec)
-    app.add_directive("begin_ros_launch", DeclareLaunch)
-    app.add_directive("end_ros_pkg", EndPackage)
-    app.add_directive("end_ros_exec", EndExec)
-    app.add_directive("end_ros_launch", EndExec)
-    app.add_directive("show_ros_pkg", ShowPacakage)
+    app.add_node(ros_package)
+    app.add_node(ros_entity)
+    app.add_node(ros_types)
+    app.add_node(ros_rendered, html=(visit_ros_rendered_html, depart_ros_rendered_html))
+    app.add_node(
+        ros_details,
+        html=(visit_ros_details_html, keep_details_inline),
+        latex=(keep_details_inline, keep_details_inline),
+        text=(keep_details_inline, keep_details_inline),
+        man=(keep_details_inline, keep_details_inline),
+        texinfo=(keep_details_inline, keep_details_inline),
+    )
+    app.add_node(
+        ros_search,
+        html=(visit_ros_search_html, None),
+        latex=(skip_html_only, None),
+        text=(skip_html_only, None),
+        man=(skip_html_only, None),
+        texinfo=(skip_html_only, None),
+    )
+    app.add_node(
+        ros_graph,
+        html=(visit_ros_graph_html, None),
+        latex=(skip_html_only, None),
+        text=(skip_html_only, None),
+        man=(skip_html_only, None),
+        texinfo=(skip_html_only, None),
+    )
+    for name, directive in ROS_DIRECTIVES.items():
+        app.add_directive(name, directive)
 
     app.add_role("ref_ros_pkg", RefPackage())
     app.add_role("ref_ros_exec", RefExec())
     app.add_role("ref_ros_launch", RefLaunch())
+
+    app.add_post_transform(ShowPackageTransform)
+    app.add_builder(RosJsonBuilder)
+    app.add_builder(RosLintBuilder)
+    app.add_domain(RosDomain)
+    app.connect("env-purge-doc", purge_ros_pkg)
+    app.connect("env-merge-info", merge_ros_pkg)
+    app.connect("env-get-outdated", outdated_ros_workspaces)
+    app.connect("env-before-read-docs", read_ros_documents_only)
+    app.connect("doctree-read", check_ros_context)
+    app.connect("env-updated", outdated_ros_pages)
+    app.connect("env-updated", report_ros_registry)
+    app.connect("env-updated", update_ros_types)
+    app.connect("env-updated", index_ros_objects)
+
+    # File written in the output directory with the timings of the build, empty to disable.
+    app.add_config_value("ros_profile", "", "", types=[str])
+    # Render the entities of every shown package in single tables, as the :compact: option.
+    app.add_config_value("ros_compact_tables", False, "html", types=[bool])
+    # Load the entities of every shown executable and launch file on demand, as :lazy:.
+    app.add_config_value("ros_lazy_details", False, "html", types=[bool])
+    # Give their own page to the executables and launch files of every shown package.
+    app.add_config_value("ros_split_pages", False, "env", types=[bool])
+    # Directory of the source directory where these pages are generated.
+    app.add_config_value("ros_pages_dir", "ros_pages", "env", types=[str])
+    # Directories searched for the packages defining interface types, relative to conf.py.
+    app.add_config_value("ros_interface_dirs", [], "", types=[list])
+    # Write the registry with the html output, for ros_aggregate.py.
+    app.add_config_value("ros_registry_fragment", True, "", types=[bool])
+    # Url of the published documentation, html_baseurl if empty.
+    app.add_config_value("ros_fragment_base_url", "", "", types=[str])
+    app.connect("builder-inited", generate_ros_pages)
+    app.connect("html-page-context", add_ros_search_script)
+    app.connect("warn-missing-reference", keep_unshown_types)
+    app.connect("build-finished", write_ros_search_index)
+    app.connect("build-finished", write_ros_fragment)
+    app.connect("doctree-resolved", note_ros_written)
+    app.connect("build-finished", remove_stale_ros_outputs)
+    app.connect("config-inited", enable_ros_profile)
+    app.connect("builder-inited", reset_ros_profile)
+    app.connect("build-finished", write_ros_profile)
     return {
         "version": "0.1",
+        # Bump when the pickled registry changes, sphinx then re-reads every document.
+        "env_version": 3,
         "parallel_read_safe": True,
         "parallel_write_safe": True,
     }
@@ -0,0 +1,226 @@
+"""Connection graph of the topics, services and actions of the ros executables.
+
+Interfaces are joined on their kind, name and types through a dictionary, in a single pass
+over every interface, so the graph is computed in linear time whatever the number of
+executables. The graph is kept as the adjacency written next to the drawing::
+
+    {
+        "executables": [{"name": ..., "package": ...}, ...],
+        "channels": [
+            {"kind": "topic", "name": ..., "type": ..., "providers": [0], "users": [1, 2]},
+            ...
+        ],
+    }
+
+where providers (publishers, servers) and users (subscribers, clients) are positions in the
+executables list. The drawing puts the providers, the channels and the users in three
+columns, each ordered after the previous one to limit the crossing edges.
+"""
+
+from __future__ import annotations
+
+from html import escape
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ros_directives import Interface, RosPackage
+
+# Channel kind of each interface category and whether the executable provides the channel.
+GRAPH_ROLES = {
+    "topic out": ("topic", True),
+    "topic in": ("topic", False),
+    "service in": ("service", True),
+    "service out": ("service", False),
+    "action": ("action", True),
+}
+
+ROW_HEIGHT = 22
+BOX_HEIGHT = 18
+CHAR_WIDTH = 7
+COLUMN_GAP = 140
+MARGIN = 10
+HEADER_HEIGHT = 30
+SVG_STYLE = (
+    "text{font:12px sans-serif;dominant-baseline:central}"
+    "rect{fill:#fff;stroke:#666}"
+    ".topic rect{fill:#e3f0fb}.service rect{fill:#e8f5e1}.action rect{fill:#fcefdc}"
+    "path{fill:none;stroke:#888;stroke-opacity:.6}"
+    ".header{font-weight:bold}"
+)
+
+
+def channel_type(interface: Interface) -> str:
+    """Return the types of an interface, which a channel connects along with its name."""
+    return ", ".join(line[1] for line in interface.get_lines() if line[1])
+
+
+def connect_interfaces(ros_pkg: dict[str, RosPackage]) -> dict:
+    """Return the graph connecting the providers and the users of every channel."""
+    executables = []
+    positions = {}
+    channels = {}
+    # By name, the order of the registry depends on the documents read again.
+    for name in sorted(ros_pkg):
+        pkg = ros_pkg[name]
+        for exe in pkg.executables.values():
+            if exe.name not in positions:
+                positions[exe.name] = len(executables)
+                executables.append({"name": exe.name, "package": pkg.name})
+            position = positions[exe.name]
+            for interface in exe.interfaces:
+                kind, provides = GRAPH_ROLES[interface.category]
+                key = (kind, interface.name, channel_type(interface))
+                ends = channels.setdefault(key, (set(), set()))
+                ends[0 if provides else 1].add(position)
+    return {
+        "executables": executables,
+        "channels": [
+            {
+                "kind": kind,
+                "name": name,
+                "type": types,
+                "providers": sorted(providers),
+                "users": sorted(users),
+            }
+            for (kind, name, types), (providers, users) in sorted(channels.items())
+        ],
+    }
+
+
+def package_subgraph(graph: dict, packages: list[str]) -> dict:
+    """Return the channels used by the executables of some packages, with all their ends."""
+    selected = {
+        position for position, exe in enumerate(graph["executables"]) if exe["package"] in packages
+    }
+    channels = [
+        channel
+        for channel in graph["channels"]
+        if not selected.isdisjoint(channel["providers"])
+        or not selected.isdisjoint(channel["users"])
+    ]
+    kept = sorted(
+        {position for channel in channels for position in channel["providers"]}
+        | {position for channel in channels for position in channel["users"]}
+    )
+    renumbered = {position: new for new, position in enumerate(kept)}
+    return {
+        "executables": [graph["executables"][position] for position in kept],
+        "channels": [
+            {
+                **channel,
+                "providers": [renumbered[position] for position in channel["providers"]],
+                "users": [renumbered[position] for position in channel["users"]],
+            }
+            for channel in channels
+        ],
+    }
+
+
+def barycenter(neighbours: list[int], rows: dict[int, int]) -> float:
+    """Return the mean row of the neighbours of a box, used to order a column."""
+    return sum(rows[neighbour] for neighbour in neighbours) / len(neighbours)
+
+
+def graph_svg(graph: dict, links: dict[str, str]) -> str:
+    """Draw the graph, the executables linking to the url given in links if any."""
+    executables = graph["executables"]
+    channels = graph["channels"]
+    providers = sorted(
+        {position for channel in channels for position in channel["providers"]},
+        key=lambda position: executables[position]["name"],
+    )
+    provider_rows = {position: row for row, position in enumerate(providers)}
+    # Channels without providers go last.
+    channel_order = sorted(
+        range(len(channels)),
+        key=lambda index: (
+            barycenter(channels[index]["providers"], provider_rows)
+            if channels[index]["providers"]
+            else len(providers),
+            channels[index]["name"],
+        ),
+    )
+    channel_rows = {index: row for row, index in enumerate(channel_order)}
+    used = {}
+    for index, channel in enumerate(channels):
+        for position in channel["users"]:
+            used.setdefault(position, []).append(channel_rows[index])
+    users = sorted(
+        used,
+        key=lambda position: (
+            sum(used[position]) / len(used[position]),
+            executables[position]["name"],
+        ),
+    )
+    user_rows = {position: row for row, position in enumerate(users)}
+
+    columns = (
+        ("Publishers, servers", [executables[position]["name"] for position in providers]),
+        ("Topics, services, actions", [channels[index]["name"] for index in channel_order]),
+        ("Subscribers, clients", [executables[position]["name"] for position in users]),
+    )
+    rows = max(len(labels) for _, labels in columns)
+    height = 2 * MARGIN + HEADER_HEIGHT + rows * ROW_HEIGHT
+    lefts = []
+    widths = []
+    left = MARGIN
+    for title, labels in columns:
+        width = CHAR_WIDTH * max(len(label) for label in [title, *labels]) + 2 * MARGIN
+        lefts.append(left)
+        widths.append(width)
+        left += width + COLUMN_GAP
+    width = left - COLUMN_GAP + MARGIN
+    # Shorter columns are centered.
+    tops = [MARGIN + HEADER_HEIGHT + (rows - len(labels)) * ROW_HEIGHT / 2 for _, labels in columns]
+
+    def middle(column: int, row: int) -> float:
+        return tops[column] + row * ROW_HEIGHT + BOX_HEIGHT / 2
+
+    def edge(column: int, row: int, next_row: int) -> str:
+        x1 = lefts[column] + widths[column]
+        x2 = lefts[column + 1]
+        y1 = middle(column, row)
+        y2 = middle(column + 1, next_row)
+        xm = (x1 + x2) / 2
+        return f"M{x1} {y1:g}C{xm:g} {y1:g} {xm:g} {y2:g} {x2} {y2:g}"
+
+    def box(column: int, row: int, label: str, kind: str, url: str | None, tooltip: str) -> str:
+        content = (
+            (f"<title>{escape(tooltip)}</title>" if tooltip else "")
+            + f'<rect x="{lefts[column]}" y="{tops[column] + row * ROW_HEIGHT:g}"'
+            f' width="{widths[column]}" height="{BOX_HEIGHT}" rx="3"/>'
+            f'<text x="{lefts[column] + MARGIN}" y="{middle(column, row):g}">{escape(label)}</text>'
+        )
+        if url:
+            content = f'<a href="{escape(url)}" target="_top">{content}</a>'
+        return f'<g class="{kind}">{content}</g>'
+
+    paths = []
+    for index, channel in enumerate(channels):
+        row = channel_rows[index]
+        paths += [edge(0, provider_rows[position], row) for position in channel["providers"]]
+        paths += [edge(1, row, user_rows[position]) for position in channel["users"]]
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height:g}"'
+        f' viewBox="0 0 {width} {height:g}">'
+    )
+    parts = [
+        header,
+        f"<style>{SVG_STYLE}</style>",
+        *(
+            f'<text class="header" x="{lefts[column]}" y="{MARGIN + HEADER_HEIGHT / 2:g}">'
+            f"{title}</text>"
+            for column, (title, _) in enumerate(columns)
+        ),
+        # A single path keeps the drawing light with thousands of edges.
+        f'<path d="{"".join(paths)}"/>' if paths else "",
+    ]
+    for column, positions in ((0, providers), (2, users)):
+        for row, position in enumerate(positions):
+            name = executables[position]["name"]
+            parts.append(box(column, row, name, "exec", links.get(name), ""))
+    for row, index in enumerate(channel_order):
+        channel = channels[index]
+        parts.append(box(1, row, channel["name"], channel["kind"], None, channel["type"]))
+    parts.append("</svg>")
+    return "\n".join(parts)
@@ -0,0 +1,115 @@
+"""Opt-in timing of the ros directives and of the rendering of ros packages.
+
+Timings are stored per document in the build environment so that parallel reads can merge
+them, as ``{docname: {stack: [calls, self seconds, total seconds]}}`` where ``stack`` is
+the ``;`` separated list of the nested timed frames, innermost last.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from sphinx.environment import BuildEnvironment
+    from sphinx.util.docutils import SphinxDirective
+
+# Frames being timed in this process: [name, start, seconds spent in nested frames, env].
+_stack: list[list] = []
+
+
+def get_profile(env: BuildEnvironment) -> dict[str, dict[str, list]]:
+    """Return the timings recorded in the build environment."""
+    if not hasattr(env, "ros_profile"):
+        env.ros_profile = {}
+    return env.ros_profile
+
+
+@contextmanager
+def profiled(env: BuildEnvironment | None, name: str) -> Iterator[None]:
+    """Time a frame, nested in the current frame or starting a new stack if env is given.
+
+    Without env, nothing is timed outside of a stack.
+    """
+    if env is None and not _stack:
+        yield
+        return
+    frame = [name, time.perf_counter(), 0.0, env if env is not None else _stack[-1][3]]
+    _stack.append(frame)
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - frame[1]
+        stack = ";".join(outer[0] for outer in _stack)
+        _stack.pop()
+        if _stack:
+            _stack[-1][2] += total
+        env = frame[3]
+        timing = get_profile(env).setdefault(env.docname, {}).setdefault(stack, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += total - frame[2]
+        timing[2] += total
+
+
+def profile_directive(name: str, directive: type[SphinxDirective]) -> type[SphinxDirective]:
+    """Return a subclass of a directive timing its run method under the directive name."""
+
+    class ProfiledDirective(directive):
+        def run(self) -> list:
+            with profiled(self.env, name):
+                return super().run()
+
+    ProfiledDirective.__name__ = directive.__name__
+    ProfiledDirective.__qualname__ = directive.__qualname__
+    return ProfiledDirective
+
+
+def profile_method(cls: type, name: str) -> None:
+    """Time a method of a class when it is called within a timed frame."""
+    method = getattr(cls, name)
+    if getattr(method, "ros_profiled", False):
+        return
+    frame_name = f"{cls.__name__}.{name}"
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs) -> object:
+        with profiled(None, frame_name):
+            return method(*args, **kwargs)
+
+    wrapper.ros_profiled = True
+    setattr(cls, name, wrapper)
+
+
+def merge_profile(env: BuildEnvironment, docnames: set[str], other: BuildEnvironment) -> None:
+    """Merge the timings of the documents read by a parallel worker."""
+    profile = get_profile(env)
+    for docname, timings in get_profile(other).items():
+        if docname in docnames:
+            profile[docname] = timings
+
+
+def write_profile(env: BuildEnvironment, path: Path) -> None:
+    """Write the timings as json and as folded stacks for flamegraph tools."""
+    by_type = {}
+    by_document = {}
+    folded = []
+    for docname, timings in sorted(get_profile(env).items()):
+        for stack, (calls, self_s, total_s) in sorted(timings.items()):
+            name = stack.rpartition(";")[2]
+            for aggregate in (by_type, by_document.setdefault(docname, {})):
+                entry = aggregate.setdefault(name, {"calls": 0, "self_s": 0.0, "total_s": 0.0})
+                entry["calls"] += calls
+                entry["self_s"] += self_s
+                # Recursive frames would be counted twice, the ros classes do not recurse.
+                entry["total_s"] += total_s
+            folded.append(f"{docname};{stack} {round(self_s * 1e6)}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as output:
+        json.dump({"by_type": by_type, "by_document": by_document}, output, indent=1)
+    path.with_suffix(".folded").write_text("\n".join(folded) + "\n", encoding="utf-8")
@@ -0,0 +1,649 @@
+"""Static extraction of ros metadata from a ros workspace.
+
+Nothing found in the workspace is ever executed: package manifests and xml launch files are
+read with an xml parser, python files with the ast module, C++ files and interface
+definitions with regular expressions and parameter files with the yaml safe loader or the csv
+module. Parse results are plain data so they can be cached in the sphinx environment.
+"""
+
+from __future__ import annotations
+
+import ast
+import csv
+import hashlib
+import io
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+PACKAGE_MANIFEST = "package.xml"
+IGNORE_MARKERS = ("COLCON_IGNORE", "AMENT_IGNORE", "CATKIN_IGNORE")
+# Directories created by colcon, never containing sources.
+SKIPPED_DIRS = {"build", "install", "log"}
+CPP_SUFFIXES = {".cpp", ".cc", ".cxx", ".hpp", ".h"}
+
+# Python calls creating an interface: category then position and keyword of the type and name.
+PY_INTERFACES = {
+    "create_publisher": ("topic out", (0, "msg_type"), (1, "topic")),
+    "create_subscription": ("topic in", (0, "msg_type"), (1, "topic")),
+    "create_service": ("service in", (0, "srv_type"), (1, "srv_name")),
+    "create_client": ("service out", (0, "srv_type"), (1, "srv_name")),
+    "ActionServer": ("action", (1, "action_type"), (2, "action_name")),
+}
+CPP_INTERFACES = {
+    "create_publisher": "topic out",
+    "create_subscription": "topic in",
+    "create_service": "service in",
+    "create_client": "service out",
+    "create_server": "action",
+}
+CPP_INTERFACE_RE = re.compile(
+    r"\b(create_publisher|create_subscription|create_service|create_client|create_server)"
+    r'\s*<\s*([\w:]+)\s*>\s*\(\s*(?:[\w\->.()]+\s*,\s*)?"([^"]+)"'
+)
+CPP_PARAM_RE = re.compile(
+    r'\bdeclare_parameter\s*(?:<\s*([\w:]+)\s*>)?\s*\(\s*"([^"]+)"\s*(?:,\s*([^;]*?))?\)\s*;'
+)
+CMAKE_EXEC_RE = re.compile(r"\badd_executable\s*\(\s*([^\s)]+)([^)]*)\)", re.IGNORECASE)
+
+# Directory and extension of each kind of interface definition, with the titles of its sections.
+INTERFACE_SECTIONS = {
+    "msg": ("Message",),
+    "srv": ("Request", "Response"),
+    "action": ("Goal", "Result", "Feedback"),
+}
+BUILTIN_TYPES = {
+    "bool",
+    "byte",
+    "char",
+    "float32",
+    "float64",
+    "int8",
+    "uint8",
+    "int16",
+    "uint16",
+    "int32",
+    "uint32",
+    "int64",
+    "uint64",
+    "string",
+    "wstring",
+    "duration",
+    "time",
+}
+# Line of an interface definition, its comment starting at the first # outside of quotes.
+DEFINITION_LINE_RE = re.compile(r"""((?:[^#"']|"[^"]*"|'[^']*')*)(?:#(.*))?""")
+FIELD_RE = re.compile(r"([\w/]+(?:<=\d+)?(?:\[[^\]]*\])?)\s+(\w+)(?:\s*(=)?\s*(.+))?")
+TYPE_SUFFIX_RE = re.compile(r"(?:<=\d+)?(?:\[[^\]]*\])?$")
+# Key of a yaml mapping line, with its indentation and its value.
+YAML_KEY_RE = re.compile(r"""(\s*)('[^']*'|"[^"]*"|[^\s'"#-][^:]*?)\s*:(?:\s.*)?""")
+PARAMETERS_KEY = "ros__parameters"
+PARAMETER_FILE_COLUMNS = ("name", "type", "default", "description")
+
+
+class WorkspaceParseError(Exception):
+    """A workspace file could not be parsed."""
+
+
+def cached_parse(cache: dict, path: Path, parser: Callable[[bytes], object]) -> object:
+    """Parse a file, reusing the previous result when its mtime or its content is unchanged."""
+    key = str(path)
+    mtime = path.stat().st_mtime_ns
+    entry = cache.get(key)
+    if entry is not None and entry[0] == mtime:
+        return entry[2]
+    content = path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    if entry is not None and entry[1] == digest:
+        cache[key] = (mtime, digest, entry[2])
+        return entry[2]
+    try:
+        result = parser(content)
+    except (SyntaxError, ValueError, ET.ParseError) as exc:
+        raise WorkspaceParseError(f"{path}: {exc}") from exc
+    cache[key] = (mtime, digest, result)
+    return result
+
+
+def find_packages(root: Path) -> Iterator[Path]:
+    """Yield the directories of the packages found in a workspace, sorted by path."""
+    if any((root / marker).exists() for marker in IGNORE_MARKERS):
+        return
+    if (root / PACKAGE_MANIFEST).is_file():
+        yield root
+        return
+    for child in sorted(root.iterdir()):
+        if child.is_dir() and child.name not in SKIPPED_DIRS and not child.name.startswith("."):
+            yield from find_packages(child)
+
+
+def workspace_listing(root: Path) -> str:
+    """Return a digest of the paths of the files of a workspace, changed when one is added.
+
+    Directories are skipped as by ``find_packages``, the ignore markers being files too.
+    """
+    listing = hashlib.sha1(usedforsecurity=False)
+    for path in sorted(_listed_files(root)):
+        listing.update(path.relative_to(root).as_posix().encode() + b"\0")
+    return listing.hexdigest()
+
+
+def _listed_files(directory: Path) -> Iterator[Path]:
+    """Yield the files of a directory and of its sub-directories not skipped."""
+    for child in directory.iterdir():
+        if child.is_dir():
+            if child.name not in SKIPPED_DIRS and not child.name.startswith("."):
+                yield from _listed_files(child)
+        elif child.is_file():
+            yield child
+
+
+def parse_package_xml(content: bytes) -> dict:
+    """Read the name, description and build type of a package manifest."""
+    root = ET.fromstring(content)  # noqa: S314, trusted workspace files
+    return {
+        "name": (root.findtext("name") or "").strip(),
+        "description": " ".join((root.findtext("description") or "").split()),
+        "build_type": (root.findtext("export/build_type") or "").strip(),
+    }
+
+
+def parse_setup_py(content: bytes) -> dict[str, str]:
+    """Return the console scripts of a setup.py as ``{name: "module:function"}``."""
+    scripts = {}
+    for node in ast.walk(ast.parse(content)):
+        if not isinstance(node, ast.keyword) or node.arg != "entry_points":
+            continue
+        if not isinstance(node.value, ast.Dict):
+            continue
+        for key, value in zip(node.value.keys, node.value.values, strict=True):
+            if _literal(key) != "console_scripts" or not isinstance(value, ast.List | ast.Tuple):
+                continue
+            for entry_node in value.elts:
+                entry = _literal(entry_node)
+                if isinstance(entry, str) and "=" in entry:
+                    name, target = entry.split("=", 1)
+                    scripts[name.strip()] = target.strip()
+    return scripts
+
+
+def parse_cmake(content: bytes) -> dict[str, list[str]]:
+    """Return the executables of a CMakeLists.txt with their source files."""
+    text = re.sub(r"#[^\n]*", "", content.decode(errors="replace"))
+    executables = {}
+    for match in CMAKE_EXEC_RE.finditer(text):
+        sources = [src for src in match.group(2).split() if Path(src).suffix in CPP_SUFFIXES]
+        executables[match.group(1)] = sources
+    return executables
+
+
+def _literal(node: ast.AST | None) -> object:
+    """Return the value of a literal node, None if it is not a literal."""
+    if node is None:
+        return None
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+
+
+def _call_name(node: ast.Call) -> str | None:
+    """Return the name of the called function or method."""
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    return None
+
+
+def _call_arg(node: ast.Call, index: int | None, keyword: str) -> ast.AST | None:
+    """Return a call argument given either by position or by keyword."""
+    if index is not None and index < len(node.args):
+        return node.args[index]
+    for kwd in node.keywords:
+        if kwd.arg == keyword:
+            return kwd.value
+    return None
+
+
+def _imported_types(tree: ast.Module) -> dict[str, str]:
+    """Map names imported from ros interface modules to their full ros type name."""
+    types = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom) or node.module is None:
+            continue
+        parts = node.module.split(".")
+        if len(parts) == 2 and parts[1] in {"msg", "srv", "action"}:  # noqa: PLR2004, pkg.kind
+            for alias in node.names:
+                types[alias.asname or alias.name] = f"{parts[0]}/{parts[1]}/{alias.name}"
+    return types
+
+
+def _interface(category: str, name: str, type_name: str) -> dict:
+    """Describe an interface with the fields expected by ``RosExec.add_interface``."""
+    interface = {"name": name, "category": category}
+    match category:
+        case "topic in":
+            interface["in_type"] = type_name
+        case "topic out":
+            interface["out_type"] = type_name
+        case "service in" | "service out":
+            interface["in_type"] = f"{type_name}_Request"
+            interface["out_type"] = f"{type_name}_Response"
+        case "action":
+            interface["in_type"] = f"{type_name}_Goal"
+            interface["out_type"] = f"{type_name}_Result"
+            interface["status_type"] = f"{type_name}_Feedback"
+    return interface
+
+
+def parse_python_node(content: bytes) -> dict:
+    """Extract the docstring, parameters and interfaces of a python node."""
+    tree = ast.parse(content)
+    types = _imported_types(tree)
+    params = []
+    interfaces = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        call = _call_name(node)
+        if call == "declare_parameter":
+            name = _literal(_call_arg(node, 0, "name"))
+            if not isinstance(name, str):
+                continue
+            default_node = _call_arg(node, 1, "value")
+            default = _literal(default_node)
+            params.append(
+                {
+                    "name": name,
+                    "type": type(default).__name__ if default is not None else None,
+                    "default": ast.unparse(default_node) if default_node is not None else None,
+                }
+            )
+        elif call in PY_INTERFACES:
+            category, type_arg, name_arg = PY_INTERFACES[call]
+            type_node = _call_arg(node, *type_arg)
+            name = _literal(_call_arg(node, *name_arg))
+            if type_node is None or not isinstance(name, str):
+                continue
+            type_name = ast.unparse(type_node)
+            interfaces.append(_interface(category, name, types.get(type_name, type_name)))
+    return {"doc": ast.get_docstring(tree) or "", "params": params, "interfaces": interfaces}
+
+
+def parse_cpp_node(content: bytes) -> dict:
+    """Extract the parameters and interfaces of a C++ node."""
+    text = content.decode(errors="replace")
+    params = [
+        {
+            "name": match.group(2),
+            "type": match.group(1),
+            "default": match.group(3).strip() if match.group(3) else None,
+        }
+        for match in CPP_PARAM_RE.finditer(text)
+    ]
+    interfaces = [
+        _interface(
+            CPP_INTERFACES[match.group(1)], match.group(3), match.group(2).replace("::", "/")
+        )
+        for match in CPP_INTERFACE_RE.finditer(text)
+    ]
+    return {"doc": "", "params": params, "interfaces": interfaces}
+
+
+def parse_launch_py(content: bytes) -> dict:
+    """Extract the docstring, arguments and nodes of a python launch file."""
+    tree = ast.parse(content)
+    args = []
+    exec_used = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        call = _call_name(node)
+        if call == "DeclareLaunchArgument":
+            name = _literal(_call_arg(node, 0, "name"))
+            if isinstance(name, str):
+                default = _call_arg(node, 1, "default_value")
+                args.append(
+                    {
+                        "name": name,
+                        "default": ast.unparse(default) if default is not None else None,
+                        "description": _literal(_call_arg(node, 2, "description")),
+                    }
+                )
+        elif call == "Node":
+            executable = _literal(_call_arg(node, None, "executable"))
+            if isinstance(executable, str) and executable not in exec_used:
+                exec_used.append(executable)
+    return {"doc": ast.get_docstring(tree) or "", "args": args, "exec_used": exec_used}
+
+
+def parse_launch_xml(content: bytes) -> dict:
+    """Extract the arguments and nodes of a xml launch file."""
+    root = ET.fromstring(content)  # noqa: S314, trusted workspace files
+    args = [
+        {
+            "name": arg.get("name"),
+            "default": arg.get("default"),
+            "description": arg.get("description"),
+        }
+        for arg in root.iter("arg")
+        if arg.get("name")
+    ]
+    exec_used = []
+    for node in root.iter("node"):
+        executable = node.get("exec") or node.get("type")
+        if executable and executable not in exec_used:
+            exec_used.append(executable)
+    return {"doc": "", "args": args, "exec_used": exec_used}
+
+
+def parse_interface_definition(content: bytes) -> dict:
+    """Read the description and the fields of each section of a .msg, .srv or .action file.
+
+    The comment lines before a field describe it with its trailing comment, the comment lines
+    at the top of the file followed by an empty line describe the type.
+    """
+    description = ""
+    sections = [[]]
+    comments = []
+    for lineno, line in enumerate(content.decode(errors="replace").splitlines(), 1):
+        code, comment = DEFINITION_LINE_RE.fullmatch(line).groups()
+        code = code.strip()
+        if code == "---":
+            sections.append([])
+            comments = []
+        elif code:
+            match = FIELD_RE.fullmatch(code)
+            if match is None:
+                raise ValueError(f"line {lineno}: invalid field {code!r}")
+            field_type, name, constant, value = match.groups()
+            if comment and comment.strip():
+                comments.append(comment.strip())
+            sections[-1].append(
+                {
+                    "type": field_type,
+                    "name": name,
+                    "value": value.strip() if value else None,
+                    "constant": constant is not None,
+                    "comment": " ".join(comments),
+                }
+            )
+            comments = []
+        elif comment is not None:
+            comments.append(comment.strip())
+        else:
+            if comments and len(sections) == 1 and not sections[0] and not description:
+                description = " ".join(comments)
+            comments = []
+    return {"description": description, "sections": sections}
+
+
+def resolve_type(type_name: str, package: str | None = None) -> str | None:
+    """Return the full name ``pkg/kind/Name`` of a type, None for a builtin or unknown type.
+
+    Bounds and array suffixes are left out, the short names of a definition are resolved in
+    the package defining it.
+    """
+    base = TYPE_SUFFIX_RE.sub("", type_name.strip())
+    if base in BUILTIN_TYPES:
+        return None
+    parts = base.split("/")
+    if len(parts) == 1:
+        if base == "Header":
+            return "std_msgs/msg/Header"
+        return f"{package}/msg/{base}" if package and base else None
+    if len(parts) == 2:  # noqa: PLR2004, pkg/Name
+        return f"{parts[0]}/msg/{parts[1]}"
+    return base
+
+
+def _yaml_comments(text: str) -> dict[str, str]:
+    """Map the dotted path of the keys of a yaml file to their comments.
+
+    The comment lines just above a key and its trailing comment describe it.
+    """
+    comments = {}
+    keys = []
+    pending = []
+    for line in text.splitlines():
+        code, comment = DEFINITION_LINE_RE.fullmatch(line).groups()
+        match = YAML_KEY_RE.fullmatch(code.rstrip())
+        if match is None:
+            if code.strip():
+                pending = []
+            elif comment is not None:
+                pending.append(comment.strip())
+            else:
+                pending = []
+            continue
+        indent = len(match.group(1))
+        while keys and keys[-1][0] >= indent:
+            keys.pop()
+        keys.append((indent, match.group(2).strip("'\"")))
+        if comment and comment.strip():
+            pending.append(comment.strip())
+        if pending:
+            comments[".".join(key for _, key in keys)] = " ".join(pending)
+        pending = []
+    return comments
+
+
+def _parameter_type(value: object) -> str | None:
+    """Return the ros parameter type of a yaml value, None if it has none."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list) and value:
+        item_type = _parameter_type(value[0])
+        return (
+            f"{item_type}_array" if item_type in {"bool", "integer", "double", "string"} else None
+        )
+    return None
+
+
+def _flatten_parameters(values: dict, prefix: str = "") -> Iterator[tuple[str, object]]:
+    """Yield the parameters of a mapping, nested names being joined by dots as in ros."""
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten_parameters(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def parse_parameters_yaml(content: bytes) -> dict[str, list[dict]]:
+    """Read the parameters of each node of a ros parameter file, ``{node: [parameter]}``.
+
+    A file without ``ros__parameters`` keys is read as the parameters of a single node, named
+    ``""``. Comments describe the parameters.
+    """
+    try:
+        import yaml
+    except ImportError as exc:
+        raise ValueError("PyYAML is needed to read yaml parameter files") from exc
+    text = content.decode(errors="replace")
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        data = yaml.load(text, Loader=loader)
+    except yaml.YAMLError as exc:
+        raise ValueError(str(exc).replace("\n", " ")) from exc
+    if not isinstance(data, dict):
+        raise ValueError("a mapping of parameters is expected")  # noqa: TRY004, parse error
+    nodes = {
+        str(node): (f"{node}.{PARAMETERS_KEY}.", values[PARAMETERS_KEY])
+        for node, values in data.items()
+        if isinstance(values, dict) and isinstance(values.get(PARAMETERS_KEY), dict)
+    } or {"": ("", data)}
+    comments = _yaml_comments(text)
+    return {
+        node: [
+            {
+                "name": name,
+                "type": _parameter_type(value),
+                "default": value if isinstance(value, str) else json.dumps(value),
+                "description": comments.get(f"{path}{name}", ""),
+            }
+            for name, value in _flatten_parameters(values)
+        ]
+        for node, (path, values) in nodes.items()
+    }
+
+
+def parse_parameters_csv(content: bytes) -> dict[str, list[dict]]:
+    """Read the parameters of a csv file with a header row, as the parameters of node ``""``.
+
+    The columns are name, type, default and description, only name is mandatory.
+    """
+    reader = csv.DictReader(io.StringIO(content.decode(errors="replace")))
+    if reader.fieldnames is None or "name" not in reader.fieldnames:
+        raise ValueError("a header row with a name column is expected")
+    try:
+        rows = list(reader)
+    except csv.Error as exc:
+        raise ValueError(str(exc)) from exc
+    return {
+        "": [
+            {column: (row.get(column) or "").strip() for column in PARAMETER_FILE_COLUMNS}
+            for row in rows
+            if (row.get("name") or "").strip()
+        ]
+    }
+
+
+def node_parameters(nodes: dict[str, list[dict]], node_name: str) -> list[dict] | None:
+    """Return the parameters of a node in a parsed parameter file, None if it has none.
+
+    Nodes match by name with or without namespace, then through the ``/**`` wildcard, and the
+    only node of a file matches any name.
+    """
+    for key, params in nodes.items():
+        if key.strip("/").rpartition("/")[2] == node_name.strip("/").rpartition("/")[2]:
+            return params
+    for key in ("/**", ""):
+        if key in nodes:
+            return nodes[key]
+    if len(nodes) == 1:
+        return next(iter(nodes.values()))
+    return None
+
+
+def _python_module(pkg_dir: Path, target: str) -> Path | None:
+    """Return the file of the module of an entry point ``module:function``."""
+    module = Path(*target.split(":")[0].strip().split("."))
+    for candidate in (pkg_dir / module.with_suffix(".py"), pkg_dir / module / "__init__.py"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _merge_nodes(results: list[dict]) -> dict:
+    """Merge the parse results of the source files of a single executable."""
+    return {
+        "doc": next((result["doc"] for result in results if result["doc"]), ""),
+        "params": [param for result in results for param in result["params"]],
+        "interfaces": [interface for result in results for interface in result["interfaces"]],
+    }
+
+
+def scan_package(pkg_dir: Path, cache: dict) -> tuple[dict, list[Path], list[str]]:
+    """Describe a package.
+
+    Also return every file the description depends on and the errors of the files which
+    could not be parsed, those files being left out of the description. Only an invalid
+    package manifest raises a ``WorkspaceParseError``.
+    """
+    manifest = pkg_dir / PACKAGE_MANIFEST
+    files = [manifest]
+    errors = []
+    package = dict(cached_parse(cache, manifest, parse_package_xml))
+    package["executables"] = {}
+    package["launch"] = {}
+
+    def parse(path: Path, parser: Callable[[bytes], object], default: object) -> object:
+        files.append(path)
+        try:
+            return cached_parse(cache, path, parser)
+        except WorkspaceParseError as exc:
+            errors.append(str(exc))
+            return default
+
+    empty_node = _merge_nodes([])
+    setup_py = pkg_dir / "setup.py"
+    if setup_py.is_file():
+        for name, target in parse(setup_py, parse_setup_py, {}).items():
+            module = _python_module(pkg_dir, target)
+            package["executables"][name] = {
+                "loc": str(module.relative_to(pkg_dir)) if module is not None else None,
+                **(parse(module, parse_python_node, empty_node) if module else empty_node),
+            }
+
+    cmake = pkg_dir / "CMakeLists.txt"
+    if cmake.is_file():
+        for name, source_names in parse(cmake, parse_cmake, {}).items():
+            sources = [pkg_dir / src for src in source_names if (pkg_dir / src).is_file()]
+            package["executables"][name] = {
+                "loc": str(sources[0].relative_to(pkg_dir)) if sources else None,
+                **_merge_nodes([parse(src, parse_cpp_node, empty_node) for src in sources]),
+            }
+
+    launch_files = [(path, parse_launch_py) for path in pkg_dir.rglob("*.launch.py")]
+    launch_files += [(path, parse_launch_xml) for path in pkg_dir.rglob("*.launch.xml")]
+    for path, parser in sorted(launch_files):
+        launch = parse(path, parser, None)
+        if launch is not None:
+            package["launch"][path.name] = {"loc": str(path.relative_to(pkg_dir)), **launch}
+    return package, files, errors
+
+
+def scan_interfaces(root: Path, cache: dict) -> tuple[dict, list[Path], list[str]]:
+    """Describe the interface types defined by the packages of a directory.
+
+    Types are indexed by full name. Also return every file read and the errors of the files
+    which could not be parsed, those files being left out.
+    """
+    types = {}
+    files = []
+    errors = []
+    for pkg_dir in find_packages(root):
+        manifest = pkg_dir / PACKAGE_MANIFEST
+        files.append(manifest)
+        try:
+            package = cached_parse(cache, manifest, parse_package_xml)["name"]
+        except WorkspaceParseError as exc:
+            errors.append(str(exc))
+            continue
+        for kind, titles in INTERFACE_SECTIONS.items():
+            for path in sorted((pkg_dir / kind).glob(f"*.{kind}")):
+                files.append(path)
+                try:
+                    definition = cached_parse(cache, path, parse_interface_definition)
+                except WorkspaceParseError as exc:
+                    errors.append(str(exc))
+                    continue
+                if len(definition["sections"]) != len(titles):
+                    errors.append(f"{path}: {len(titles)} sections expected, separated by ---")
+                    continue
+                types[f"{package}/{kind}/{path.stem}"] = {
+                    "description": definition["description"],
+                    "sections": [
+                        (
+                            title,
+                            [
+                                {**field, "ref": resolve_type(field["type"], package)}
+                                for field in fields
+                            ],
+                        )
+                        for title, fields in zip(titles, definition["sections"], strict=True)
+                    ],
+                }
+    return types, files, errors
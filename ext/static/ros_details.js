@@ -0,0 +1,61 @@
+/* Load the details of the ros executables and launch files written apart by ros_directives. */
+"use strict";
+
+(() => {
+  const root =
+    document.documentElement.dataset.content_root ??
+    (typeof DOCUMENTATION_OPTIONS === "undefined" ? "" : DOCUMENTATION_OPTIONS.URL_ROOT);
+  const base = new URL(root, document.baseURI);
+  const loads = new WeakMap();
+
+  const load = (details) => {
+    if (!loads.has(details)) {
+      const content = details.querySelector(".ros-details-content");
+      const loading = fetch(new URL(details.dataset.src, base))
+        .then((response) => {
+          if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+          return response.text();
+        })
+        .then((html) => {
+          content.innerHTML = html;
+        })
+        .catch((error) => {
+          // Let a later opening try again.
+          loads.delete(details);
+          content.textContent = `Cannot load the details: ${error.message}`;
+        });
+      loads.set(details, loading);
+    }
+    return loads.get(details);
+  };
+
+  // Links to a parameter, interface or argument open the details holding it.
+  const reveal = async () => {
+    const id = decodeURIComponent(location.hash.slice(1));
+    if (!id || document.getElementById(id)) return;
+    let owner = null;
+    let longest = 0;
+    for (const details of document.querySelectorAll("details.ros-details")) {
+      for (const prefix of details.dataset.prefixes.split(" ")) {
+        if (id.startsWith(prefix) && prefix.length > longest) {
+          owner = details;
+          longest = prefix.length;
+        }
+      }
+    }
+    if (owner === null) return;
+    owner.open = true;
+    await load(owner);
+    document.getElementById(id)?.scrollIntoView();
+  };
+
+  window.addEventListener("hashchange", reveal);
+  document.addEventListener("DOMContentLoaded", () => {
+    for (const details of document.querySelectorAll("details.ros-details")) {
+      details.addEventListener("toggle", () => {
+        if (details.open) load(details);
+      });
+    }
+    reveal();
+  });
+})();
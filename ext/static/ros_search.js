@@ -0,0 +1,108 @@
+/* Instant lookup of the ros objects listed by ros_directives in _static/ros_index.json. */
+"use strict";
+
+(() => {
+  const KIND_LABELS = {
+    package: "package",
+    executable: "executable",
+    launch: "launch file",
+    parameter: "parameter",
+    interface: "interface",
+    argument: "launch argument",
+    type: "type",
+  };
+  const MAX_RESULTS = 50;
+  const root =
+    document.documentElement.dataset.content_root ??
+    (typeof DOCUMENTATION_OPTIONS === "undefined" ? "" : DOCUMENTATION_OPTIONS.URL_ROOT);
+  // Pages are relative to the root, or full urls in an index merged by ros_aggregate.py.
+  const base = new URL(root, document.baseURI);
+  let index = null;
+
+  // Entities of an executable or a launch file refer to it for their page and anchor.
+  const OWNED = new Set(["parameter", "interface", "argument"]);
+
+  const decode = ({ kinds, anchors, pages, entries }) => {
+    const decoded = entries.map(([name, kind, target, extra]) => {
+      const entry = { name, key: name.toLowerCase(), kind: kinds[kind], detail: extra };
+      if (entry.kind === "type") return entry;
+      let page = target;
+      let anchor = `${anchors[entry.kind]}_${name}`;
+      if (OWNED.has(entry.kind)) {
+        const [owner, , ownerPage] = entries[target];
+        page = ownerPage;
+        anchor = `${anchors[entry.kind]}_${owner}_${name}`;
+        entry.detail = extra ? `${owner}, ${extra}` : owner;
+      }
+      entry.href = new URL(`${pages[page]}#${encodeURIComponent(anchor)}`, base).href;
+      return entry;
+    });
+    // Types lead to the interface using them.
+    entries.forEach(([, , target], position) => {
+      const entry = decoded[position];
+      if (entry.kind !== "type") return;
+      const interfaceEntry = decoded[target];
+      entry.href = interfaceEntry.href;
+      entry.detail = `${interfaceEntry.kind} ${interfaceEntry.name}`;
+    });
+    return decoded;
+  };
+
+  // Fetched once, on the first use of a search box.
+  const loadIndex = () => {
+    index ??= fetch(`${root}_static/ros_index.json`)
+      .then((response) => response.json())
+      .then(decode);
+    return index;
+  };
+
+  // Entries are sorted by name: names starting with the query come first, then the others.
+  const lookup = (entries, query) => {
+    const starting = [];
+    const containing = [];
+    for (const entry of entries) {
+      const position = entry.key.indexOf(query);
+      if (position === 0) {
+        starting.push(entry);
+        if (starting.length === MAX_RESULTS) break;
+      } else if (position > 0 && containing.length < MAX_RESULTS) {
+        containing.push(entry);
+      }
+    }
+    return starting.concat(containing).slice(0, MAX_RESULTS);
+  };
+
+  const render = (list, results) => {
+    list.replaceChildren(
+      ...results.map((entry) => {
+        const item = document.createElement("li");
+        const link = document.createElement("a");
+        link.href = entry.href;
+        link.textContent = entry.name;
+        const label = KIND_LABELS[entry.kind] ?? entry.kind;
+        item.append(link, ` (${label}${entry.detail ? `, ${entry.detail}` : ""})`);
+        return item;
+      }),
+    );
+  };
+
+  const setUp = (box) => {
+    const input = box.querySelector("input");
+    const list = box.querySelector("ul");
+    input.addEventListener("focus", loadIndex, { once: true });
+    input.addEventListener("input", async () => {
+      const query = input.value.trim().toLowerCase();
+      if (!query) {
+        list.replaceChildren();
+        return;
+      }
+      const entries = await loadIndex();
+      // Skip the results of a query already replaced by a newer one.
+      if (input.value.trim().toLowerCase() === query) render(list, lookup(entries, query));
+    });
+  };
+
+  document.addEventListener("DOMContentLoaded", () =>
+    document.querySelectorAll(".ros-search").forEach(setUp),
+  );
+})();